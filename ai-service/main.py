@@ -1,18 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import numpy as np
 from datetime import datetime
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
 
-from services.risk_predictor import RiskPredictor
+from services.risk_predictor import RiskPredictor, VITAL_ORDER
 from services.alert_generator import AlertGenerator
 from services.explainable_rules import ExplainableRules
+from services.shared_roster import SharedRoster, parse_timestamp
+from services.state_store import StateStore
+from services.sensitivity import SensitivityAnalyzer
+from services.sampling_cadence import SamplingCadence
+from services.signal_quality import SignalQualityFilter
+from services.alert_sink import AlertSink
+from services.vitals_history import VitalsHistory
+from services.worker_presence import WorkerPresence
+from services.http_cache import BatchGZipMiddleware, CachedBody, ResponseCache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="MedIQ AI Service",
     description="AI-powered risk prediction and alert generation for healthcare",
@@ -31,10 +44,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stream-compress large batch responses
+app.add_middleware(
+    BatchGZipMiddleware,
+    paths=[
+        "/api/ai/batch-assess-risk",
+        "/api/ai/batch-generate-alert",
+        "/api/ai/risk-heatmap",
+        "/api/ai/sampling-cadence"
+    ],
+    minimum_size=1024
+)
+
 # Initialize services
 risk_predictor = RiskPredictor()
 alert_generator = AlertGenerator()
 explainable_rules = ExplainableRules()
+sensitivity_analyzer = SensitivityAnalyzer(risk_predictor)
+sampling_cadence = SamplingCadence()
+signal_quality = SignalQualityFilter()
+# Precomputed bodies for read-heavy GET endpoints
+explain_rules_body = CachedBody(explainable_rules.get_all_rules())
+heatmap_cache = ResponseCache()
+vitals_history = VitalsHistory(
+    raw_capacity=int(os.getenv("HISTORY_RAW_CAPACITY", "3600")),
+    idle_seconds=float(os.getenv("HISTORY_IDLE_SECONDS", "86400"))
+)
+# History lives in one process, so it is only kept and served while this is the only worker
+history_workers = WorkerPresence(os.getenv("HISTORY_LOCK_NAME", "mediq_history"))
+
+# Shared-memory roster of current patient state, visible to every uvicorn worker
+shared_roster = None
+if os.getenv("SHARED_ROSTER_ENABLED", "true").lower() == "true":
+    try:
+        shared_roster = SharedRoster(
+            name=os.getenv("SHARED_ROSTER_NAME", "mediq_roster"),
+            capacity=int(os.getenv("SHARED_ROSTER_CAPACITY", "4096"))
+        )
+    except OSError:
+        shared_roster = None
+
+# Roster snapshot + delta log and vitals history for warm restarts (disabled unless a directory is set)
+STATE_SNAPSHOT_DIR = os.getenv("STATE_SNAPSHOT_DIR")
+STATE_SNAPSHOT_INTERVAL = float(os.getenv("STATE_SNAPSHOT_INTERVAL", "30"))
+state_store = None
+if shared_roster is not None and STATE_SNAPSHOT_DIR:
+    state_store = StateStore(STATE_SNAPSHOT_DIR)
+history_snapshot_path = None
+if STATE_SNAPSHOT_DIR:
+    history_snapshot_path = os.path.join(STATE_SNAPSHOT_DIR, "vitals_history.npz")
+
+def save_history():
+    # An emptied (multi-worker) or partial history must not replace a complete snapshot
+    if history_workers.alone() and len(vitals_history):
+        vitals_history.save(history_snapshot_path)
+
+async def snapshot_state_periodically():
+    while True:
+        await asyncio.sleep(STATE_SNAPSHOT_INTERVAL)
+        if state_store is not None:
+            await asyncio.to_thread(state_store.snapshot, shared_roster)
+        if history_snapshot_path is not None:
+            await asyncio.to_thread(save_history)
+
+# Optional push of generated alerts to the backend
+alert_sink = None
+if os.getenv("ALERT_SINK_URL"):
+    alert_sink = AlertSink(
+        url=os.getenv("ALERT_SINK_URL"),
+        flush_interval=float(os.getenv("ALERT_SINK_FLUSH_INTERVAL", "1.0")),
+        max_batch=int(os.getenv("ALERT_SINK_MAX_BATCH", "100")),
+        max_pending=int(os.getenv("ALERT_SINK_MAX_PENDING", "5000"))
+    )
+
+@app.on_event("startup")
+async def start_alert_sink():
+    if alert_sink is not None:
+        await alert_sink.start()
+
+@app.on_event("shutdown")
+async def stop_alert_sink():
+    if alert_sink is not None:
+        await alert_sink.stop()
+
+@app.on_event("startup")
+async def restore_state():
+    if history_snapshot_path is None:
+        return
+    if state_store is not None:
+        state_store.attach(shared_roster)
+    if history_workers.alone():
+        vitals_history.load(history_snapshot_path)
+    app.state.snapshot_task = asyncio.create_task(snapshot_state_periodically())
+
+@app.on_event("shutdown")
+async def persist_state():
+    if history_snapshot_path is None:
+        return
+    app.state.snapshot_task.cancel()
+    if state_store is not None:
+        state_store.snapshot(shared_roster)
+        state_store.close()
+    save_history()
 
 # Request/Response Models
 class VitalSigns(BaseModel):
@@ -49,6 +160,7 @@ class VitalSigns(BaseModel):
 class PatientData(BaseModel):
     patientId: str
     vitals: VitalSigns
+    wardId: Optional[str] = None
     age: Optional[int] = None
     medicalHistory: Optional[List[str]] = None
     currentMedications: Optional[List[str]] = None
@@ -65,6 +177,8 @@ class RiskAssessmentResponse(BaseModel):
     explanation: str
     contributingFactors: List[str]
     recommendations: List[str]
+    recommendedSampleInterval: Optional[float] = None
+    qualityFlags: Dict[str, str] = {}
     timestamp: str
 
 class AlertRequest(BaseModel):
@@ -83,6 +197,42 @@ class AlertResponse(BaseModel):
     actionableSteps: List[str]
     timestamp: str
 
+def publish_assessment(
+    patient: PatientData,
+    risk_score: float,
+    risk_level: str,
+    vitals: Optional[Dict[str, Optional[float]]] = None,
+    ingest: bool = True
+):
+    """
+    Record the assessment in the roster sibling workers read and, for an
+    ingested reading, in the chart history. Anything else (a heatmap poll)
+    only updates the roster with readings newer than the one it holds.
+    """
+    if vitals is None:
+        vitals = patient.vitals.dict()
+    if ingest and history_workers.alone():
+        vitals_history.append(patient.patientId, vitals, parse_timestamp(patient.vitals.timestamp))
+    elif ingest and len(vitals_history):
+        # A sibling worker started; history here would only ever be partial
+        vitals_history.clear()
+    
+    if shared_roster is None:
+        return
+    # The roster is a read cache; failing to publish must never fail the assessment
+    try:
+        shared_roster.update(
+            patient_id=patient.patientId,
+            vitals=vitals,
+            risk_score=risk_score,
+            risk_level=risk_level,
+            ward_id=patient.wardId,
+            vitals_timestamp=patient.vitals.timestamp,
+            only_newer=not ingest
+        )
+    except Exception:
+        logger.exception("Could not publish %s to the shared roster", patient.patientId)
+
 # Health check
 @app.get("/")
 async def root():
@@ -96,6 +246,83 @@ async def root():
 async def health():
     return {"status": "healthy", "service": "ai-service"}
 
+@app.get("/api/ai/alert-sink/status")
+async def alert_sink_status():
+    """
+    Delivery counters and queue depth of the outbound alert sink
+    """
+    if alert_sink is None:
+        return {"enabled": False}
+    return {"enabled": True, **alert_sink.status()}
+
+def build_risk_assessment(
+    request: RiskAssessmentRequest,
+    trend_risk: Optional[float] = None,
+    quality: Optional[Tuple[Dict[str, Optional[float]], Dict[str, str]]] = None
+) -> RiskAssessmentResponse:
+    """
+    Score, explain and publish one patient; trend_risk and the signal
+    quality result may be precomputed for a whole batch
+    """
+    historical = request.historicalVitals or []
+    
+    # Drop missing and implausible readings before scoring; spikes are kept
+    if quality is None:
+        quality = signal_quality.assess(request.patientData.vitals, historical)
+    usable_vitals, quality_flags = quality
+    vitals = request.patientData.vitals.copy(update=usable_vitals)
+    
+    if trend_risk is None:
+        trend_risk = risk_predictor.trend_risk(vitals, historical)
+    
+    # Calculate risk score using ML + rule-based logic
+    risk_score, risk_level, factors = risk_predictor.calculate_risk(
+        vitals=vitals,
+        age=request.patientData.age,
+        medical_history=request.patientData.medicalHistory or [],
+        historical_vitals=historical,
+        trend_risk=trend_risk
+    )
+    
+    # Generate explainable explanation
+    explanation = explainable_rules.generate_explanation(
+        risk_score=risk_score,
+        risk_level=risk_level,
+        vitals=vitals,
+        contributing_factors=factors
+    )
+    
+    # Generate recommendations
+    recommendations = explainable_rules.generate_recommendations(
+        risk_level=risk_level,
+        vitals=vitals,
+        factors=factors
+    )
+    
+    # Suggested seconds until this bed's next reading
+    sample_interval = sampling_cadence.recommend_interval(
+        risk_score=risk_score,
+        risk_level=risk_level,
+        trend_risk=trend_risk,
+        quality_flags=quality_flags
+    )
+    
+    response = RiskAssessmentResponse(
+        patientId=request.patientData.patientId,
+        riskScore=round(risk_score, 2),
+        riskLevel=risk_level,
+        explanation=explanation,
+        contributingFactors=factors,
+        recommendations=recommendations,
+        recommendedSampleInterval=sample_interval,
+        qualityFlags=quality_flags,
+        timestamp=datetime.now().isoformat()
+    )
+    
+    publish_assessment(request.patientData, risk_score, risk_level, usable_vitals)
+    
+    return response
+
 # Risk Prediction Endpoint
 @app.post("/api/ai/assess-risk", response_model=RiskAssessmentResponse)
 async def assess_risk(request: RiskAssessmentRequest):
@@ -103,40 +330,7 @@ async def assess_risk(request: RiskAssessmentRequest):
     Assess patient risk based on vital signs and medical history
     """
     try:
-        vitals = request.patientData.vitals
-        
-        # Calculate risk score using ML + rule-based logic
-        risk_score, risk_level, factors = risk_predictor.calculate_risk(
-            vitals=vitals,
-            age=request.patientData.age,
-            medical_history=request.patientData.medicalHistory or [],
-            historical_vitals=request.historicalVitals or []
-        )
-        
-        # Generate explainable explanation
-        explanation = explainable_rules.generate_explanation(
-            risk_score=risk_score,
-            risk_level=risk_level,
-            vitals=vitals,
-            contributing_factors=factors
-        )
-        
-        # Generate recommendations
-        recommendations = explainable_rules.generate_recommendations(
-            risk_level=risk_level,
-            vitals=vitals,
-            factors=factors
-        )
-        
-        return RiskAssessmentResponse(
-            patientId=request.patientData.patientId,
-            riskScore=round(risk_score, 2),
-            riskLevel=risk_level,
-            explanation=explanation,
-            contributingFactors=factors,
-            recommendations=recommendations,
-            timestamp=datetime.now().isoformat()
-        )
+        return build_risk_assessment(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -154,6 +348,10 @@ async def generate_alert(request: AlertRequest):
             risk_level=request.riskLevel
         )
         
+        # Stable patients are not pushed, as in the batch endpoint
+        if alert_sink is not None and alert["alertType"] != "stable":
+            alert_sink.offer(alert)
+        
         return AlertResponse(
             alertId=alert["alertId"],
             patientId=alert["patientId"],
@@ -167,16 +365,56 @@ async def generate_alert(request: AlertRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch Alert Generation
+@app.post("/api/ai/batch-generate-alert")
+async def batch_generate_alert(requests: List[AlertRequest]):
+    """
+    Generate alerts for a whole ward in one request; stable patients are
+    listed by id only
+    """
+    try:
+        result = alert_generator.generate_alerts_batch(
+            patient_ids=[request.patientId for request in requests],
+            vitals_list=[request.vitals for request in requests],
+            risk_scores=[request.riskScore for request in requests],
+            risk_levels=[request.riskLevel for request in requests]
+        )
+        
+        if alert_sink is not None:
+            for alert in result["alerts"]:
+                alert_sink.offer({
+                    **alert,
+                    "actionableSteps": result["actionableSteps"][alert["alertType"]],
+                    "timestamp": result["timestamp"]
+                })
+        
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Batch Risk Assessment
 @app.post("/api/ai/batch-assess-risk")
 async def batch_assess_risk(patients: List[RiskAssessmentRequest]):
     """
     Assess risk for multiple patients at once
     """
+    historical_list = [patient_request.historicalVitals or [] for patient_request in patients]
+    
+    # Signal quality and trends for the whole batch in one array pass each
+    qualities = signal_quality.assess_many(
+        [patient_request.patientData.vitals for patient_request in patients],
+        historical_list
+    )
+    usable_list = [
+        patient_request.patientData.vitals.copy(update=usable_vitals)
+        for patient_request, (usable_vitals, _) in zip(patients, qualities)
+    ]
+    trend_risks = risk_predictor.batch_trend_risk(usable_list, historical_list)
+    
     results = []
-    for patient_request in patients:
+    for patient_request, trend_risk, quality in zip(patients, trend_risks, qualities):
         try:
-            result = await assess_risk(patient_request)
+            result = build_risk_assessment(patient_request, float(trend_risk), quality)
             results.append(result)
         except Exception as e:
             results.append({
@@ -185,13 +423,127 @@ async def batch_assess_risk(patients: List[RiskAssessmentRequest]):
             })
     return {"results": results, "total": len(results)}
 
+# What-if / Threshold Sensitivity
+@app.post("/api/ai/what-if")
+async def what_if(request: RiskAssessmentRequest):
+    """
+    Distance from each vital to the next risk level boundaries, and each
+    vital's current contribution to the risk score
+    """
+    try:
+        historical = request.historicalVitals or []
+        usable_vitals, quality_flags = signal_quality.assess(request.patientData.vitals, historical)
+        vitals = request.patientData.vitals.copy(update=usable_vitals)
+        context_risk = risk_predictor.context_risk(
+            vitals=vitals,
+            medical_history=request.patientData.medicalHistory or [],
+            historical_vitals=historical
+        )
+        analysis = sensitivity_analyzer.analyze(
+            baseline=risk_predictor.vitals_to_array(vitals),
+            context_risk=context_risk
+        )
+        
+        return {
+            "patientId": request.patientData.patientId,
+            **analysis,
+            "qualityFlags": quality_flags,
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Ward Sampling Cadence
+@app.post("/api/ai/sampling-cadence")
+async def ward_sampling_cadence(patients: List[RiskAssessmentRequest]):
+    """
+    Recommended vitals sampling interval for every patient in a ward,
+    with total ingest volume and per-patient staleness
+    """
+    try:
+        historical_list = [patient_request.historicalVitals or [] for patient_request in patients]
+        qualities = signal_quality.assess_many(
+            [patient_request.patientData.vitals for patient_request in patients],
+            historical_list
+        )
+        usable_list = [
+            patient_request.patientData.vitals.copy(update=usable_vitals)
+            for patient_request, (usable_vitals, _) in zip(patients, qualities)
+        ]
+        trend_risks = risk_predictor.batch_trend_risk(usable_list, historical_list)
+        
+        plan = []
+        for patient_request, usable_vitals, trend_risk, (_, quality_flags) in zip(
+            patients, usable_list, trend_risks, qualities
+        ):
+            patient = patient_request.patientData
+            risk_score, risk_level, _ = risk_predictor.calculate_risk(
+                vitals=usable_vitals,
+                age=patient.age,
+                medical_history=patient.medicalHistory or [],
+                trend_risk=float(trend_risk)
+            )
+            plan.append({
+                "patientId": patient.patientId,
+                "riskScore": round(risk_score, 2),
+                "riskLevel": risk_level,
+                "recommendedSampleInterval": sampling_cadence.recommend_interval(
+                    risk_score=risk_score,
+                    risk_level=risk_level,
+                    trend_risk=float(trend_risk),
+                    quality_flags=quality_flags
+                ),
+                "lastSampleAt": parse_timestamp(patient.vitals.timestamp)
+            })
+        
+        return sampling_cadence.ward_plan(plan)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Vitals History for Charts
+@app.get("/api/ai/history/{patient_id}")
+async def vitals_history_series(
+    patient_id: str,
+    vital: str = Query("heartRate"),
+    points: int = Query(500),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    method: str = Query("lttb")
+):
+    """
+    Downsampled vitals history for one patient, sized to the chart's point budget.
+    History is kept in-process, so it is only available when the service runs
+    with a single worker.
+    """
+    if not history_workers.alone():
+        raise HTTPException(
+            status_code=503,
+            detail="Vitals history needs a single worker; run the AI service with --workers 1"
+        )
+    if vital not in VITAL_ORDER:
+        raise HTTPException(status_code=400, detail=f"Unknown vital: {vital}")
+    if method not in ("lttb", "minmax"):
+        raise HTTPException(status_code=400, detail=f"Unknown method: {method}")
+    
+    series = vitals_history.query(
+        patient_id,
+        vital,
+        points=points,
+        start=parse_timestamp(start) if start else None,
+        end=parse_timestamp(end) if end else None,
+        method=method
+    )
+    if series is None:
+        raise HTTPException(status_code=404, detail="No history for patient")
+    return series
+
 # Explainable Rules Endpoint
 @app.get("/api/ai/explain-rules")
-async def explain_rules():
+async def explain_rules(request: Request):
     """
     Get explainable rules used for risk assessment
     """
-    return explainable_rules.get_all_rules()
+    return explain_rules_body.respond(request)
 
 # Risk Heatmap Data
 @app.post("/api/ai/risk-heatmap")
@@ -199,27 +551,65 @@ async def generate_risk_heatmap(patients: List[PatientData]):
     """
     Generate risk heatmap data for multiple patients
     """
-    heatmap_data = []
+    values = np.array(
+        [risk_predictor.vitals_to_array(patient.vitals) for patient in patients],
+        dtype=float
+    ).reshape(len(patients), len(VITAL_ORDER))
+    usable, quality_codes = signal_quality.assess_batch(values)
+    history_risks = np.array([
+        risk_predictor.context_risk(patient.vitals, patient.medicalHistory or [])
+        for patient in patients
+    ])
     
-    for patient in patients:
-        try:
-            risk_score, risk_level, _ = risk_predictor.calculate_risk(
-                vitals=patient.vitals,
-                age=patient.age,
-                medical_history=patient.medicalHistory or []
-            )
-            
-            heatmap_data.append({
-                "patientId": patient.patientId,
-                "riskScore": round(risk_score, 2),
-                "riskLevel": risk_level,
-                "vitals": patient.vitals.dict()
-            })
-        except Exception as e:
-            continue
+    # Score the whole ward in one pass, ignoring readings the quality stage rejected
+    risk_scores = risk_predictor.score_matrix(values, history_risks, usable)
+    
+    heatmap_data = []
+    for patient, risk_score, codes in zip(patients, risk_scores, quality_codes):
+        risk_score = float(risk_score)
+        risk_level = risk_predictor.risk_level(risk_score)
+        heatmap_data.append({
+            "patientId": patient.patientId,
+            "riskScore": round(risk_score, 2),
+            "riskLevel": risk_level,
+            "vitals": patient.vitals.dict(),
+            "qualityFlags": signal_quality.flags(codes)
+        })
+        publish_assessment(patient, risk_score, risk_level, signal_quality.filtered(patient.vitals, codes), ingest=False)
     
     return {"heatmap": heatmap_data}
 
+@app.get("/api/ai/risk-heatmap")
+async def get_risk_heatmap(request: Request, wardId: Optional[str] = Query(None)):
+    """
+    Risk heatmap from the latest scores published by any worker
+    """
+    if shared_roster is None:
+        raise HTTPException(status_code=503, detail="Shared roster is disabled")
+    
+    # Re-read only when some worker has written to the roster since the last read, and
+    # re-encoded only when this ward's rows changed; the ETag identifies the content
+    cached = heatmap_cache.get(
+        key=wardId,
+        version=shared_roster.version,
+        build=lambda: {"heatmap": shared_roster.snapshot(ward_id=wardId)}
+    )
+    return cached.respond(request)
+
+# Shared Roster
+@app.get("/api/ai/roster/{patient_id}")
+async def get_roster_entry(patient_id: str):
+    """
+    Current vitals and risk for one patient, as last published by any worker
+    """
+    if shared_roster is None:
+        raise HTTPException(status_code=503, detail="Shared roster is disabled")
+    
+    entry = shared_roster.get(patient_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Patient not found in roster")
+    return entry
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
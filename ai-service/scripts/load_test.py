@@ -0,0 +1,411 @@
+"""
+Load generator for the MedIQ AI service.
+
+Replays a hospital-like traffic mix against a locally launched
+`main:app` (or an already running instance with --url):
+- per-bed /api/ai/assess-risk at a fixed cadence
+- periodic /api/ai/risk-heatmap and /api/ai/batch-assess-risk calls
+- bursts of /api/ai/generate-alert
+
+The synthetic LOAD-* patients end up in the target's roster and history,
+and its alert sink would forward the critical alerts to a real backend.
+--url is therefore refused unless --allow-external is also given, and the
+alert bursts are always left out against an external instance.
+
+Arrivals are open-loop (Poisson): requests are fired on schedule whether or
+not earlier ones have finished, and latency is measured from the scheduled
+send time, so a saturated server shows up as growing latency instead of
+silently lowering the offered load. The load is stepped through the
+--multipliers and the first step where the server stops keeping up is
+reported as the saturation knee; the sweep stops there.
+
+Usage:
+    python scripts/load_test.py --beds 200 --workers 4 --output results.json
+    python scripts/load_test.py --url http://localhost:8000 --allow-external --multipliers 1,2,4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+
+import httpx
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stable starting vitals; each bed random-walks from here
+BASELINE_VITALS = {
+    "heartRate": 78,
+    "systolicBP": 122,
+    "diastolicBP": 78,
+    "oxygenSaturation": 97,
+    "respiratoryRate": 16,
+    "temperature": 98.4
+}
+WALK_STEP = {
+    "heartRate": 2.0,
+    "systolicBP": 2.5,
+    "diastolicBP": 1.5,
+    "oxygenSaturation": 0.4,
+    "respiratoryRate": 0.6,
+    "temperature": 0.05
+}
+HISTORY_LENGTH = 10
+
+# Settings that would make a launched server write into a real instance's state;
+# blanked (not removed, so .env cannot bring them back) unless given with --server-env
+ISOLATED_ENV = ("STATE_SNAPSHOT_DIR", "ALERT_SINK_URL")
+
+# A step counts as saturated when it misses any of these
+MIN_THROUGHPUT_RATIO = 0.95
+MAX_ERROR_RATE = 0.01
+MAX_P99_GROWTH = 3.0
+
+
+class Bed:
+    def __init__(self, index: int, rng: random.Random):
+        self.patient_id = f"LOAD-{index:05d}"
+        self.ward_id = f"WARD-{index % 8}"
+        self.rng = rng
+        self.vitals = dict(BASELINE_VITALS)
+        self.history = deque(maxlen=HISTORY_LENGTH)
+        # A few beds drift toward deterioration so every alert path gets exercised
+        self.drift = -0.15 if rng.random() < 0.1 else 0.0
+
+    def next_reading(self) -> dict:
+        for name, step in WALK_STEP.items():
+            self.vitals[name] += self.rng.gauss(0, step)
+        self.vitals["oxygenSaturation"] = min(100.0, self.vitals["oxygenSaturation"] + self.drift)
+        reading = {name: round(value, 1) for name, value in self.vitals.items()}
+        reading["timestamp"] = datetime.now(timezone.utc).isoformat()
+        return reading
+
+    def assessment(self) -> dict:
+        reading = self.next_reading()
+        request = {
+            "patientData": {
+                "patientId": self.patient_id,
+                "wardId": self.ward_id,
+                "vitals": reading,
+                "age": 60
+            },
+            "historicalVitals": list(self.history)
+        }
+        self.history.append(reading)
+        return request
+
+    def alert(self) -> dict:
+        reading = self.next_reading()
+        return {
+            "patientId": self.patient_id,
+            "vitals": reading,
+            "riskScore": self.rng.uniform(50, 95),
+            "riskLevel": self.rng.choice(["high", "critical"])
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sent = 0
+
+    def record(self, endpoint: str, latency: float, ok: bool) -> None:
+        self.latencies[endpoint].append(latency)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            values = np.array(samples) * 1000
+            endpoints[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors[endpoint],
+                "errorRate": round(self.errors[endpoint] / len(samples), 4),
+                "throughput": round(len(samples) / elapsed, 2),
+                "p50Ms": round(float(np.percentile(values, 50)), 2),
+                "p90Ms": round(float(np.percentile(values, 90)), 2),
+                "p99Ms": round(float(np.percentile(values, 99)), 2),
+                "maxMs": round(float(values.max()), 2)
+            }
+        return endpoints
+
+
+async def send(client, recorder, endpoint, method, path, payload, scheduled_at):
+    try:
+        if method == "GET":
+            response = await client.get(path)
+        else:
+            response = await client.post(path, json=payload)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    # Measured from the scheduled time, not the actual send, to avoid coordinated omission
+    recorder.record(endpoint, time.perf_counter() - scheduled_at, ok)
+
+
+async def poisson_stream(rate, duration, fire, rng):
+    """Call fire(scheduled_at) at Poisson arrival times for `duration` seconds"""
+    if rate <= 0:
+        return
+    start = time.perf_counter()
+    next_at = start + rng.expovariate(rate)
+    while next_at < start + duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        fire(next_at)
+        next_at += rng.expovariate(rate)
+
+
+async def run_stage(args, base_url, beds, multiplier, rng, heatmap_enabled=True, alerts_enabled=True):
+    recorder = Recorder()
+    tasks = set()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        def spawn(endpoint, method, path, payload, scheduled_at):
+            recorder.sent += 1
+            task = asyncio.create_task(send(client, recorder, endpoint, method, path, payload, scheduled_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def assess(scheduled_at):
+            bed = rng.choice(beds)
+            spawn("assess-risk", "POST", "/api/ai/assess-risk", bed.assessment(), scheduled_at)
+
+        def heatmap(scheduled_at):
+            ward_id = rng.choice(beds).ward_id
+            spawn("risk-heatmap", "GET", f"/api/ai/risk-heatmap?wardId={ward_id}", None, scheduled_at)
+
+        def batch(scheduled_at):
+            sample = rng.sample(beds, min(args.batch_size, len(beds)))
+            spawn("batch-assess-risk", "POST", "/api/ai/batch-assess-risk",
+                  [bed.assessment() for bed in sample], scheduled_at)
+
+        def alert_burst(scheduled_at):
+            for bed in rng.sample(beds, min(args.burst_size, len(beds))):
+                spawn("generate-alert", "POST", "/api/ai/generate-alert", bed.alert(), scheduled_at)
+
+        streams = [
+            (multiplier * len(beds) / args.cadence, assess),
+            (multiplier / args.heatmap_interval if heatmap_enabled else 0, heatmap),
+            (multiplier / args.batch_interval, batch),
+            (multiplier / args.burst_interval if alerts_enabled else 0, alert_burst)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            poisson_stream(rate, args.duration, fire, random.Random(rng.random()))
+            for rate, fire in streams
+        ])
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+    nominal = sum(rate * (args.burst_size if fire is alert_burst else 1) for rate, fire in streams)
+    endpoints = recorder.summary(elapsed)
+    completed = sum(stats["count"] for stats in endpoints.values())
+    errors = sum(stats["errors"] for stats in endpoints.values())
+    all_latencies = np.concatenate([np.array(samples) for samples in recorder.latencies.values()]) * 1000 \
+        if recorder.latencies else np.zeros(1)
+
+    return {
+        "multiplier": multiplier,
+        "nominalRps": round(nominal, 2),
+        # Requests actually scheduled during the step; achieved falls behind it once responses queue up
+        "offeredRps": round(recorder.sent / args.duration, 2),
+        "achievedRps": round(completed / elapsed, 2),
+        "errorRate": round(errors / completed, 4) if completed else 0.0,
+        "p99Ms": round(float(np.percentile(all_latencies, 99)), 2),
+        "elapsedSeconds": round(elapsed, 2),
+        "endpoints": endpoints
+    }
+
+
+def find_knee(stages):
+    """First step where throughput, errors or tail latency stop keeping up"""
+    if not stages:
+        return None
+    baseline_p99 = stages[0]["p99Ms"] or 1.0
+    for stage in stages:
+        reasons = []
+        if stage["achievedRps"] < MIN_THROUGHPUT_RATIO * stage["offeredRps"]:
+            reasons.append("throughput")
+        if stage["errorRate"] > MAX_ERROR_RATE:
+            reasons.append("errors")
+        if stage["p99Ms"] > MAX_P99_GROWTH * baseline_p99:
+            reasons.append("latency")
+        if reasons:
+            return {"multiplier": stage["multiplier"], "offeredRps": stage["offeredRps"], "reasons": reasons}
+    return None
+
+
+def supported_beds(beds, stages, knee):
+    sustained = [stage["multiplier"] for stage in stages if knee is None or stage["multiplier"] < knee["multiplier"]]
+    return int(beds * sustained[-1]) if sustained else 0
+
+
+def launch_server(args, instance):
+    """Start main:app with its shared state under names unique to this run"""
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1",
+        "--port", str(args.port),
+        "--workers", str(args.workers),
+        "--log-level", "warning"
+    ]
+    env = dict(os.environ)
+    env.update({name: "" for name in ISOLATED_ENV})
+    env["SHARED_ROSTER_NAME"] = f"{instance}_roster"
+    env["HISTORY_LOCK_NAME"] = f"{instance}_history"
+    for assignment in args.server_env:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+    return subprocess.Popen(command, cwd=SERVICE_DIR, env=env), env
+
+
+def remove_server_state(env):
+    """Unlink the launched server's roster segment and lock files"""
+    name = env["SHARED_ROSTER_NAME"]
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        pass
+    else:
+        segment.close()
+        segment.unlink()
+    history = env["HISTORY_LOCK_NAME"]
+    for lock_name in (f"{name}.lock", f"{history}.leader.lock", f"{history}.member.lock"):
+        try:
+            os.remove(os.path.join(tempfile.gettempdir(), lock_name))
+        except FileNotFoundError:
+            pass
+
+
+async def wait_until_healthy(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"AI service at {base_url} did not become healthy")
+
+
+async def heatmap_available(base_url):
+    """GET /risk-heatmap answers 503 when the server runs without the shared roster"""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        return (await client.get("/api/ai/risk-heatmap")).status_code != 503
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    beds = [Bed(i, random.Random(rng.random())) for i in range(args.beds)]
+    multipliers = [float(value) for value in args.multipliers.split(",")]
+
+    server = None
+    base_url = args.url
+    alerts_enabled = base_url is None
+    if base_url is not None:
+        print(
+            f"warning: sending synthetic LOAD-* patients to {base_url}; "
+            "they will appear in its roster. /generate-alert bursts are left out"
+        )
+    else:
+        server, server_env = launch_server(args, f"mediq_load_{uuid.uuid4().hex[:8]}")
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        await wait_until_healthy(base_url)
+        heatmap_enabled = await heatmap_available(base_url)
+        if not heatmap_enabled:
+            print("shared roster disabled on the server: skipping the heatmap stream")
+        stages = []
+        for multiplier in multipliers:
+            stage = await run_stage(args, base_url, beds, multiplier, rng, heatmap_enabled, alerts_enabled)
+            stages.append(stage)
+            print(
+                f"x{multiplier:<5} offered {stage['offeredRps']:>8.1f} rps  "
+                f"achieved {stage['achievedRps']:>8.1f} rps  "
+                f"p99 {stage['p99Ms']:>8.1f} ms  errors {stage['errorRate']:.2%}"
+            )
+            if find_knee(stages) is not None:
+                break  # Heavier steps past the knee only queue up further
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+            remove_server_state(server_env)
+
+    knee = find_knee(stages)
+    result = {
+        "config": {
+            "url": base_url,
+            "workers": args.workers if server is not None else None,
+            "serverEnv": args.server_env,
+            "heatmapStream": heatmap_enabled,
+            "alertStream": alerts_enabled,
+            "beds": args.beds,
+            "cadenceSeconds": args.cadence,
+            "durationSeconds": args.duration,
+            "multipliers": multipliers
+        },
+        "stages": stages,
+        "knee": knee,
+        # Beds sustainable at the configured cadence: the last step before the knee
+        "supportedBeds": supported_beds(args.beds, stages, knee)
+    }
+    print(f"knee: {json.dumps(knee)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the MedIQ AI service")
+    parser.add_argument("--url", help="Target an already running service instead of launching main:app "
+                                      "(requires --allow-external)")
+    parser.add_argument("--allow-external", action="store_true",
+                        help="Confirm that --url may receive synthetic patients; alert bursts are not sent")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the launched server")
+    parser.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Environment for the launched server, e.g. SHARED_ROSTER_CAPACITY=8192; "
+                             "with SHARED_ROSTER_ENABLED=false the heatmap stream is skipped")
+    parser.add_argument("--beds", type=int, default=100)
+    parser.add_argument("--cadence", type=float, default=4.0, help="Seconds between readings per bed")
+    parser.add_argument("--heatmap-interval", type=float, default=5.0)
+    parser.add_argument("--batch-interval", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--burst-interval", type=float, default=15.0)
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load step")
+    parser.add_argument("--multipliers", default="0.5,1,2,4,8", help="Load steps relative to the configured mix")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    args = parser.parse_args()
+    if args.url and not args.allow_external:
+        parser.error(f"--url would write synthetic patients into {args.url}; add --allow-external to proceed")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,8 +1,13 @@
-from typing import Dict, List
+import sys
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid
+import numpy as np
 from pydantic import BaseModel
 
+from services.risk_predictor import VITAL_ORDER
+from services.text_templates import StaticText
+
 class VitalSigns(BaseModel):
     heartRate: Optional[float] = None
     systolicBP: Optional[float] = None
@@ -11,6 +16,181 @@ class VitalSigns(BaseModel):
     respiratoryRate: Optional[float] = None
     temperature: Optional[float] = None
 
+# Alert types in the precedence order used by _determine_alert_type
+ALERT_TYPES = (
+    "respiratory_distress",
+    "cardiac_alert",
+    "hypotension",
+    "high_risk",
+    "oxygen_desaturation",
+    "tachypnea",
+    "fever",
+    "elevated_risk",
+    "moderate_risk",
+    "stable"
+)
+ALERT_SEVERITIES = {
+    "respiratory_distress": "critical",
+    "cardiac_alert": "critical",
+    "hypotension": "critical",
+    "high_risk": "critical",
+    "oxygen_desaturation": "warning",
+    "tachypnea": "warning",
+    "fever": "warning",
+    "elevated_risk": "warning",
+    "moderate_risk": "info",
+    "stable": "info"
+}
+STABLE_ALERT_TYPE = ALERT_TYPES.index("stable")
+
+# Alert text by alert type, called with (vitals, score)
+ALERT_MESSAGES = {
+    "respiratory_distress": lambda vitals, score: f"Critical: Oxygen saturation at {vitals.oxygenSaturation}% - Immediate intervention required",
+    "cardiac_alert": lambda vitals, score: f"Critical: Heart rate {vitals.heartRate} bpm - Cardiac monitoring required",
+    "hypotension": lambda vitals, score: f"Critical: Systolic BP {vitals.systolicBP} mmHg - Hypotension detected",
+    "high_risk": lambda vitals, score: f"Critical: Patient risk score {score:.1f} - Immediate assessment required",
+    "oxygen_desaturation": lambda vitals, score: f"Warning: Oxygen saturation {vitals.oxygenSaturation}% - Monitor closely",
+    "tachypnea": lambda vitals, score: f"Warning: Respiratory rate {vitals.respiratoryRate} breaths/min - Elevated",
+    "fever": lambda vitals, score: f"Warning: Temperature {vitals.temperature}°F - Fever detected",
+    "elevated_risk": lambda vitals, score: f"Warning: Patient risk score {score:.1f} - Increased monitoring recommended",
+    "moderate_risk": lambda vitals, score: f"Info: Patient risk score {score:.1f} - Continue routine monitoring",
+    "stable": lambda vitals, score: f"Info: Patient risk score {score:.1f} - Patient stable"
+}
+
+ALERT_EXPLANATIONS = {
+    "respiratory_distress": lambda vitals, score: (
+        f"Patient's oxygen saturation ({vitals.oxygenSaturation}%) is critically low. "
+        "This indicates potential respiratory failure or severe hypoxemia. "
+        "Normal range is 95-100%. Immediate oxygen therapy and respiratory support may be required."
+    ),
+    "cardiac_alert": lambda vitals, score: (
+        f"Patient's heart rate ({vitals.heartRate} bpm) is outside normal range (60-100 bpm). "
+        "This may indicate cardiac arrhythmia, stress response, or medication effects. "
+        "Continuous cardiac monitoring and ECG assessment recommended."
+    ),
+    "hypotension": lambda vitals, score: (
+        f"Patient's systolic blood pressure ({vitals.systolicBP} mmHg) is below normal range (90-140 mmHg). "
+        "This may indicate shock, dehydration, or cardiovascular compromise. "
+        "Fluid resuscitation and blood pressure support may be necessary."
+    ),
+    "oxygen_desaturation": lambda vitals, score: (
+        f"Patient's oxygen saturation ({vitals.oxygenSaturation}%) is below optimal range (95-100%). "
+        "This suggests mild to moderate hypoxemia. Monitor for signs of respiratory distress "
+        "and consider supplemental oxygen if trend continues."
+    ),
+    "tachypnea": lambda vitals, score: (
+        f"Patient's respiratory rate ({vitals.respiratoryRate} breaths/min) is elevated above normal (12-20/min). "
+        "This may indicate respiratory distress, anxiety, or metabolic acidosis. "
+        "Assess for underlying causes and monitor for progression."
+    ),
+    "fever": lambda vitals, score: (
+        f"Patient's temperature ({vitals.temperature}°F) indicates fever. "
+        "This may suggest infection or inflammatory process. "
+        "Consider infection workup and antipyretic management."
+    ),
+    "elevated_risk": lambda vitals, score: (
+        f"Patient's overall risk score ({score:.1f}) indicates elevated risk. "
+        "Multiple vital signs are outside normal ranges, suggesting potential clinical deterioration. "
+        "Increased monitoring frequency and clinical assessment recommended."
+    ),
+    "moderate_risk": lambda vitals, score: (
+        f"Patient's risk score ({score:.1f}) indicates moderate risk. "
+        "Some vital signs are slightly outside normal ranges. "
+        "Continue routine monitoring and assess for trends."
+    ),
+    "stable": lambda vitals, score: (
+        f"Patient's risk score ({score:.1f}) indicates stable condition. "
+        "Vital signs are within acceptable ranges. "
+        "Continue standard monitoring protocols."
+    ),
+    "high_risk": lambda vitals, score: (
+        f"Patient's risk score ({score:.1f}) indicates high risk requiring immediate attention. "
+        "Multiple abnormal vital signs detected. "
+        "Immediate clinical assessment and intervention may be necessary."
+    )
+}
+
+DEFAULT_EXPLANATION = sys.intern("Alert generated based on patient vital signs and risk assessment.")
+
+ACTIONABLE_STEPS = {
+    "respiratory_distress": StaticText(
+        "Administer supplemental oxygen immediately",
+        "Notify respiratory therapy",
+        "Consider non-invasive ventilation if indicated",
+        "Obtain arterial blood gas (ABG) analysis",
+        "Notify physician/rapid response team",
+        "Monitor oxygen saturation continuously"
+    ),
+    "cardiac_alert": StaticText(
+        "Place patient on continuous cardiac monitoring",
+        "Obtain 12-lead ECG",
+        "Notify cardiology if available",
+        "Check for medication effects",
+        "Assess for signs of cardiac compromise",
+        "Notify physician immediately"
+    ),
+    "hypotension": StaticText(
+        "Assess fluid status and hydration",
+        "Consider IV fluid bolus if indicated",
+        "Check for signs of bleeding or shock",
+        "Monitor blood pressure every 15 minutes",
+        "Notify physician",
+        "Assess for medication effects"
+    ),
+    "oxygen_desaturation": StaticText(
+        "Assess patient's respiratory effort",
+        "Consider supplemental oxygen",
+        "Monitor oxygen saturation trend",
+        "Assess for signs of respiratory distress",
+        "Notify nurse/physician if trend continues"
+    ),
+    "tachypnea": StaticText(
+        "Assess for signs of respiratory distress",
+        "Check for anxiety or pain",
+        "Monitor respiratory rate trend",
+        "Consider oxygen support if indicated",
+        "Notify healthcare provider"
+    ),
+    "fever": StaticText(
+        "Obtain cultures if infection suspected",
+        "Administer antipyretics as ordered",
+        "Monitor temperature trend",
+        "Assess for signs of infection",
+        "Notify physician for infection workup"
+    ),
+    "elevated_risk": StaticText(
+        "Increase monitoring frequency",
+        "Notify primary care team",
+        "Review patient's medical history",
+        "Assess for clinical deterioration",
+        "Consider escalation of care"
+    ),
+    "moderate_risk": StaticText(
+        "Continue routine monitoring",
+        "Document vital signs",
+        "Assess for trends",
+        "Notify if condition changes"
+    ),
+    "stable": StaticText(
+        "Continue standard monitoring",
+        "Document vital signs",
+        "Maintain current care plan"
+    ),
+    "high_risk": StaticText(
+        "Immediate clinical assessment required",
+        "Notify rapid response team",
+        "Increase monitoring frequency",
+        "Prepare for potential intervention",
+        "Document all findings"
+    )
+}
+
+DEFAULT_ACTIONABLE_STEPS = StaticText(
+    "Monitor patient closely",
+    "Notify healthcare provider",
+    "Document findings"
+)
+
 class AlertGenerator:
     """
     Generate explainable alerts based on patient risk and vital signs
@@ -54,6 +234,95 @@ class AlertGenerator:
             "timestamp": datetime.now().isoformat()
         }
     
+    def classify_batch(
+        self,
+        values: np.ndarray,
+        risk_levels: List[str]
+    ) -> np.ndarray:
+        """
+        Vectorized _determine_alert_type for many patients.
+        values: (N, 6) vitals in VITAL_ORDER, NaN where missing.
+        Returns an index into ALERT_TYPES per patient.
+        """
+        values = np.asarray(values, dtype=float)
+        # Same truthiness rule as the scalar path: 0 counts as missing
+        present = np.isfinite(values) & (values != 0)
+        column = {name: i for i, name in enumerate(VITAL_ORDER)}
+        
+        def below(name, limit):
+            return present[:, column[name]] & (values[:, column[name]] < limit)
+        
+        def above(name, limit):
+            return present[:, column[name]] & (values[:, column[name]] > limit)
+        
+        levels = np.asarray(risk_levels, dtype=str)
+        critical = levels == "critical"
+        high = levels == "high"
+        
+        conditions = [
+            critical & below('oxygenSaturation', 90),
+            critical & (below('heartRate', 40) | above('heartRate', 150)),
+            critical & below('systolicBP', 80),
+            critical,
+            high & below('oxygenSaturation', 93),
+            high & above('respiratoryRate', 24),
+            high & above('temperature', 101),
+            high,
+            levels == "medium"
+        ]
+        return np.select(conditions, np.arange(len(conditions)), default=STABLE_ALERT_TYPE)
+    
+    def generate_alerts_batch(
+        self,
+        patient_ids: List[str],
+        vitals_list: List[VitalSigns],
+        risk_scores: List[float],
+        risk_levels: List[str]
+    ) -> Dict:
+        """
+        Classify a whole ward in one pass; text is rendered only for
+        patients that are not stable. Actionable steps are returned once
+        per alert type rather than repeated per patient.
+        """
+        values = np.array([
+            [np.nan if getattr(vitals, name) is None else getattr(vitals, name) for name in VITAL_ORDER]
+            for vitals in vitals_list
+        ], dtype=float).reshape(len(vitals_list), len(VITAL_ORDER))
+        type_indices = self.classify_batch(values, risk_levels)
+        
+        alerts = []
+        for i in np.flatnonzero(type_indices != STABLE_ALERT_TYPE):
+            alert_type = ALERT_TYPES[type_indices[i]]
+            vitals, risk_score = vitals_list[i], risk_scores[i]
+            alerts.append({
+                "alertId": str(uuid.uuid4()),
+                "patientId": patient_ids[i],
+                "alertType": alert_type,
+                "severity": ALERT_SEVERITIES[alert_type],
+                "message": ALERT_MESSAGES[alert_type](vitals, risk_score),
+                "explanation": self._generate_explanation(vitals, risk_score, risk_levels[i], alert_type)
+            })
+        
+        alert_types = {alert["alertType"] for alert in alerts}
+        type_counts = np.bincount(type_indices, minlength=len(ALERT_TYPES))
+        severity_counts = {"critical": 0, "warning": 0, "info": 0}
+        for index, alert_type in enumerate(ALERT_TYPES):
+            if index != STABLE_ALERT_TYPE:
+                severity_counts[ALERT_SEVERITIES[alert_type]] += int(type_counts[index])
+        stable = [patient_ids[i] for i in np.flatnonzero(type_indices == STABLE_ALERT_TYPE)]
+        
+        return {
+            "alerts": alerts,
+            "stable": stable,
+            "actionableSteps": {
+                alert_type: ACTIONABLE_STEPS[alert_type].to_list()
+                for alert_type in ALERT_TYPES if alert_type in alert_types
+            },
+            "counts": severity_counts,
+            "total": len(patient_ids),
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def _determine_alert_type(
         self,
         vitals: VitalSigns,
@@ -68,25 +337,25 @@ class AlertGenerator:
                 return (
                     "respiratory_distress",
                     "critical",
-                    f"Critical: Oxygen saturation at {vitals.oxygenSaturation}% - Immediate intervention required"
+                    ALERT_MESSAGES["respiratory_distress"](vitals, risk_score)
                 )
             elif vitals.heartRate and (vitals.heartRate < 40 or vitals.heartRate > 150):
                 return (
                     "cardiac_alert",
                     "critical",
-                    f"Critical: Heart rate {vitals.heartRate} bpm - Cardiac monitoring required"
+                    ALERT_MESSAGES["cardiac_alert"](vitals, risk_score)
                 )
             elif vitals.systolicBP and vitals.systolicBP < 80:
                 return (
                     "hypotension",
                     "critical",
-                    f"Critical: Systolic BP {vitals.systolicBP} mmHg - Hypotension detected"
+                    ALERT_MESSAGES["hypotension"](vitals, risk_score)
                 )
             else:
                 return (
                     "high_risk",
                     "critical",
-                    f"Critical: Patient risk score {risk_score:.1f} - Immediate assessment required"
+                    ALERT_MESSAGES["high_risk"](vitals, risk_score)
                 )
         
         # High risk alerts
@@ -95,25 +364,25 @@ class AlertGenerator:
                 return (
                     "oxygen_desaturation",
                     "warning",
-                    f"Warning: Oxygen saturation {vitals.oxygenSaturation}% - Monitor closely"
+                    ALERT_MESSAGES["oxygen_desaturation"](vitals, risk_score)
                 )
             elif vitals.respiratoryRate and vitals.respiratoryRate > 24:
                 return (
                     "tachypnea",
                     "warning",
-                    f"Warning: Respiratory rate {vitals.respiratoryRate} breaths/min - Elevated"
+                    ALERT_MESSAGES["tachypnea"](vitals, risk_score)
                 )
             elif vitals.temperature and vitals.temperature > 101:
                 return (
                     "fever",
                     "warning",
-                    f"Warning: Temperature {vitals.temperature}°F - Fever detected"
+                    ALERT_MESSAGES["fever"](vitals, risk_score)
                 )
             else:
                 return (
                     "elevated_risk",
                     "warning",
-                    f"Warning: Patient risk score {risk_score:.1f} - Increased monitoring recommended"
+                    ALERT_MESSAGES["elevated_risk"](vitals, risk_score)
                 )
         
         # Medium risk alerts
@@ -121,7 +390,7 @@ class AlertGenerator:
             return (
                 "moderate_risk",
                 "info",
-                f"Info: Patient risk score {risk_score:.1f} - Continue routine monitoring"
+                ALERT_MESSAGES["moderate_risk"](vitals, risk_score)
             )
         
         # Low risk
@@ -129,7 +398,7 @@ class AlertGenerator:
             return (
                 "stable",
                 "info",
-                f"Info: Patient risk score {risk_score:.1f} - Patient stable"
+                ALERT_MESSAGES["stable"](vitals, risk_score)
             )
     
     def _generate_explanation(
@@ -141,60 +410,10 @@ class AlertGenerator:
     ) -> str:
         """Generate explainable explanation for the alert"""
         
-        explanations = {
-            "respiratory_distress": (
-                f"Patient's oxygen saturation ({vitals.oxygenSaturation}%) is critically low. "
-                f"This indicates potential respiratory failure or severe hypoxemia. "
-                f"Normal range is 95-100%. Immediate oxygen therapy and respiratory support may be required."
-            ),
-            "cardiac_alert": (
-                f"Patient's heart rate ({vitals.heartRate} bpm) is outside normal range (60-100 bpm). "
-                f"This may indicate cardiac arrhythmia, stress response, or medication effects. "
-                f"Continuous cardiac monitoring and ECG assessment recommended."
-            ),
-            "hypotension": (
-                f"Patient's systolic blood pressure ({vitals.systolicBP} mmHg) is below normal range (90-140 mmHg). "
-                f"This may indicate shock, dehydration, or cardiovascular compromise. "
-                f"Fluid resuscitation and blood pressure support may be necessary."
-            ),
-            "oxygen_desaturation": (
-                f"Patient's oxygen saturation ({vitals.oxygenSaturation}%) is below optimal range (95-100%). "
-                f"This suggests mild to moderate hypoxemia. Monitor for signs of respiratory distress "
-                f"and consider supplemental oxygen if trend continues."
-            ),
-            "tachypnea": (
-                f"Patient's respiratory rate ({vitals.respiratoryRate} breaths/min) is elevated above normal (12-20/min). "
-                f"This may indicate respiratory distress, anxiety, or metabolic acidosis. "
-                f"Assess for underlying causes and monitor for progression."
-            ),
-            "fever": (
-                f"Patient's temperature ({vitals.temperature}°F) indicates fever. "
-                f"This may suggest infection or inflammatory process. "
-                f"Consider infection workup and antipyretic management."
-            ),
-            "elevated_risk": (
-                f"Patient's overall risk score ({risk_score:.1f}) indicates elevated risk. "
-                f"Multiple vital signs are outside normal ranges, suggesting potential clinical deterioration. "
-                f"Increased monitoring frequency and clinical assessment recommended."
-            ),
-            "moderate_risk": (
-                f"Patient's risk score ({risk_score:.1f}) indicates moderate risk. "
-                f"Some vital signs are slightly outside normal ranges. "
-                f"Continue routine monitoring and assess for trends."
-            ),
-            "stable": (
-                f"Patient's risk score ({risk_score:.1f}) indicates stable condition. "
-                f"Vital signs are within acceptable ranges. "
-                f"Continue standard monitoring protocols."
-            ),
-            "high_risk": (
-                f"Patient's risk score ({risk_score:.1f}) indicates high risk requiring immediate attention. "
-                f"Multiple abnormal vital signs detected. "
-                f"Immediate clinical assessment and intervention may be necessary."
-            )
-        }
-        
-        return explanations.get(alert_type, "Alert generated based on patient vital signs and risk assessment.")
+        template = ALERT_EXPLANATIONS.get(alert_type)
+        if template is None:
+            return DEFAULT_EXPLANATION
+        return template(vitals, risk_score)
     
     def _generate_actionable_steps(
         self,
@@ -204,83 +423,5 @@ class AlertGenerator:
     ) -> List[str]:
         """Generate actionable steps based on alert type"""
         
-        steps_map = {
-            "respiratory_distress": [
-                "Administer supplemental oxygen immediately",
-                "Notify respiratory therapy",
-                "Consider non-invasive ventilation if indicated",
-                "Obtain arterial blood gas (ABG) analysis",
-                "Notify physician/rapid response team",
-                "Monitor oxygen saturation continuously"
-            ],
-            "cardiac_alert": [
-                "Place patient on continuous cardiac monitoring",
-                "Obtain 12-lead ECG",
-                "Notify cardiology if available",
-                "Check for medication effects",
-                "Assess for signs of cardiac compromise",
-                "Notify physician immediately"
-            ],
-            "hypotension": [
-                "Assess fluid status and hydration",
-                "Consider IV fluid bolus if indicated",
-                "Check for signs of bleeding or shock",
-                "Monitor blood pressure every 15 minutes",
-                "Notify physician",
-                "Assess for medication effects"
-            ],
-            "oxygen_desaturation": [
-                "Assess patient's respiratory effort",
-                "Consider supplemental oxygen",
-                "Monitor oxygen saturation trend",
-                "Assess for signs of respiratory distress",
-                "Notify nurse/physician if trend continues"
-            ],
-            "tachypnea": [
-                "Assess for signs of respiratory distress",
-                "Check for anxiety or pain",
-                "Monitor respiratory rate trend",
-                "Consider oxygen support if indicated",
-                "Notify healthcare provider"
-            ],
-            "fever": [
-                "Obtain cultures if infection suspected",
-                "Administer antipyretics as ordered",
-                "Monitor temperature trend",
-                "Assess for signs of infection",
-                "Notify physician for infection workup"
-            ],
-            "elevated_risk": [
-                "Increase monitoring frequency",
-                "Notify primary care team",
-                "Review patient's medical history",
-                "Assess for clinical deterioration",
-                "Consider escalation of care"
-            ],
-            "moderate_risk": [
-                "Continue routine monitoring",
-                "Document vital signs",
-                "Assess for trends",
-                "Notify if condition changes"
-            ],
-            "stable": [
-                "Continue standard monitoring",
-                "Document vital signs",
-                "Maintain current care plan"
-            ],
-            "high_risk": [
-                "Immediate clinical assessment required",
-                "Notify rapid response team",
-                "Increase monitoring frequency",
-                "Prepare for potential intervention",
-                "Document all findings"
-            ]
-        }
-        
-        return steps_map.get(alert_type, [
-            "Monitor patient closely",
-            "Notify healthcare provider",
-            "Document findings"
-        ])
-
-
+        steps = ACTIONABLE_STEPS.get(alert_type, DEFAULT_ACTIONABLE_STEPS)
+        return steps.to_list()
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+
+class AlertSink:
+    """
+    Push generated alerts to the backend over one pooled async HTTP client.
+
+    Non-critical alerts are queued and sent together once per flush
+    interval (or as soon as a full batch is waiting). Critical alerts skip
+    the queue and are sent immediately, up to max_critical_in_flight at a
+    time; beyond that they go to the front of the queue and the flusher is
+    woken. Both queues are bounded: when the pending queue is full new
+    alerts are refused (offer() returns False) and counted.
+
+    A failed batch is retried with exponential backoff, starting at
+    retry_base_delay and doubling up to max_retry_delay, until
+    retry_deadline seconds have passed since its first failure. Critical
+    batches ignore the deadline: they are only given up when the retry
+    queue is full of other critical batches.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        flush_interval: float = 1.0,
+        max_batch: int = 100,
+        max_pending: int = 5000,
+        max_retry_batches: int = 50,
+        retry_base_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+        retry_deadline: float = 120.0,
+        timeout: float = 5.0,
+        max_connections: int = 10,
+        max_critical_in_flight: int = 20
+    ):
+        self.url = url
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_retry_batches = max_retry_batches
+        self.retry_base_delay = retry_base_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_deadline = retry_deadline
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_critical_in_flight = max_critical_in_flight
+
+        self._pending: Deque[Dict] = deque()
+        # (batch, critical, deadline, due, delay), times on the monotonic clock
+        self._retry: Deque[Tuple[List[Dict], bool, float, float, float]] = deque()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._in_flight: set = set()
+        self._stopping = False
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retried": 0,
+            "criticalSent": 0
+        }
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+        self._wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Let the current flush finish, send whatever is still queued, then close the client"""
+        self._stopping = True
+        if self._flush_task is not None:
+            # Woken rather than cancelled: a batch already taken off the queue must not be lost
+            self._wakeup.set()
+            await self._flush_task
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        # Last chance for batches still backing off; whatever fails now is lost
+        await self.flush(retry_all=True)
+        self.stats["dropped"] += sum(len(entry[0]) for entry in self._retry)
+        self._retry.clear()
+        if self._client is not None:
+            await self._client.aclose()
+
+    def offer(self, alert: Dict) -> bool:
+        """Queue an alert for delivery; False when it was refused for backpressure"""
+        critical = alert.get("severity") == "critical"
+        if critical and len(self._in_flight) < self.max_critical_in_flight:
+            task = asyncio.create_task(self._deliver([alert], critical=True))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            return True
+
+        if critical:
+            # Too many critical sends already outstanding: next in line for the flusher
+            if len(self._pending) >= self.max_pending:
+                self._pending.pop()
+                self.stats["dropped"] += 1
+            self._pending.appendleft(alert)
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return True
+
+        if len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            return False
+
+        self._pending.append(alert)
+        if len(self._pending) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def status(self) -> Dict:
+        return {
+            "url": self.url,
+            "pending": len(self._pending),
+            "retryBatches": len(self._retry),
+            **self.stats
+        }
+
+    async def flush(self, retry_all: bool = False) -> None:
+        """Send retries that are due (all of them with retry_all), then the pending queue in max_batch chunks"""
+        now = time.monotonic()
+        due = [entry for entry in self._retry if retry_all or entry[3] <= now]
+        for entry in due:
+            self._retry.remove(entry)
+        for batch, critical, deadline, _, delay in due:
+            self.stats["retried"] += 1
+            await self._deliver(batch, critical=critical, deadline=deadline, delay=delay)
+
+        while self._pending:
+            count = min(self.max_batch, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(count)]
+            critical = any(alert.get("severity") == "critical" for alert in batch)
+            await self._deliver(batch, critical=critical)
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping:
+            timeout = self.flush_interval
+            if self._retry:
+                # Wake early when a retry falls due before the next regular flush
+                next_due = min(entry[3] for entry in self._retry)
+                timeout = min(timeout, max(0.0, next_due - time.monotonic()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _deliver(
+        self,
+        batch: List[Dict],
+        critical: bool = False,
+        deadline: Optional[float] = None,
+        delay: Optional[float] = None
+    ) -> None:
+        """Send one batch; deadline and delay carry a retried batch's backoff state"""
+        try:
+            response = await self._client.post(self.url, json={"alerts": batch})
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.stats["failed"] += len(batch)
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + self.retry_deadline
+                delay = self.retry_base_delay
+            else:
+                delay = min(delay * 2, self.max_retry_delay)
+            if critical or now + delay <= deadline:
+                self._schedule_retry((batch, critical, deadline, now + delay, delay))
+            else:
+                self.stats["dropped"] += len(batch)
+            return
+
+        self.stats["sent"] += len(batch)
+        self.stats["criticalSent"] += sum(1 for alert in batch if alert.get("severity") == "critical")
+
+    def _schedule_retry(self, entry: Tuple[List[Dict], bool, float, float, float]) -> None:
+        if len(self._retry) >= self.max_retry_batches:
+            # Full: give up on the oldest non-critical batch first, the new one included;
+            # a critical batch only makes way for another critical batch
+            victim = next((queued for queued in self._retry if not queued[1]), None)
+            if victim is None:
+                victim = self._retry[-1] if entry[1] else entry
+            self.stats["dropped"] += len(victim[0])
+            if victim is entry:
+                return
+            self._retry.remove(victim)
+        # Critical alerts go to the front so they are retried first
+        if entry[1]:
+            self._retry.appendleft(entry)
+        else:
+            self._retry.append(entry)
+        if self._wakeup is not None:
+            self._wakeup.set()  # the flusher re-times its wait for this retry
@@ -1,6 +1,9 @@
-from typing import List, Dict
+import sys
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 
+from services.text_templates import StaticText
+
 class VitalSigns(BaseModel):
     heartRate: Optional[float] = None
     systolicBP: Optional[float] = None
@@ -9,6 +12,38 @@ class VitalSigns(BaseModel):
     respiratoryRate: Optional[float] = None
     temperature: Optional[float] = None
 
+# Recommendation text, compiled once
+LEVEL_RECOMMENDATIONS = {
+    "critical": StaticText(
+        "Immediate clinical assessment required",
+        "Notify rapid response team",
+        "Consider escalation to ICU if appropriate",
+        "Increase monitoring frequency to every 5-15 minutes",
+        "Prepare for potential emergency intervention"
+    ),
+    "high": StaticText(
+        "Increase monitoring frequency",
+        "Notify primary care team",
+        "Consider additional diagnostic tests",
+        "Review medication regimen",
+        "Assess for clinical deterioration"
+    ),
+    "medium": StaticText(
+        "Continue routine monitoring",
+        "Document vital signs",
+        "Assess for trends",
+        "Notify if condition changes"
+    ),
+    "low": StaticText(
+        "Continue standard monitoring",
+        "Maintain current care plan"
+    )
+}
+OXYGEN_RECOMMENDATION = sys.intern("Consider supplemental oxygen therapy")
+CARDIAC_RECOMMENDATION = sys.intern("Consider ECG monitoring and cardiac assessment")
+FLUID_RECOMMENDATION = sys.intern("Assess fluid status and consider fluid resuscitation")
+MAX_RECOMMENDATIONS = 8
+
 class ExplainableRules:
     """
     Generate explainable rules and recommendations
@@ -79,48 +114,19 @@ class ExplainableRules:
     ) -> List[str]:
         """Generate actionable recommendations"""
         
-        recommendations = []
-        
-        if risk_level == "critical":
-            recommendations.extend([
-                "Immediate clinical assessment required",
-                "Notify rapid response team",
-                "Consider escalation to ICU if appropriate",
-                "Increase monitoring frequency to every 5-15 minutes",
-                "Prepare for potential emergency intervention"
-            ])
-        elif risk_level == "high":
-            recommendations.extend([
-                "Increase monitoring frequency",
-                "Notify primary care team",
-                "Consider additional diagnostic tests",
-                "Review medication regimen",
-                "Assess for clinical deterioration"
-            ])
-        elif risk_level == "medium":
-            recommendations.extend([
-                "Continue routine monitoring",
-                "Document vital signs",
-                "Assess for trends",
-                "Notify if condition changes"
-            ])
-        else:
-            recommendations.extend([
-                "Continue standard monitoring",
-                "Maintain current care plan"
-            ])
+        recommendations = LEVEL_RECOMMENDATIONS.get(risk_level, LEVEL_RECOMMENDATIONS["low"]).to_list()
         
         # Vital-specific recommendations
         if vitals.oxygenSaturation and vitals.oxygenSaturation < 93:
-            recommendations.append("Consider supplemental oxygen therapy")
+            recommendations.append(OXYGEN_RECOMMENDATION)
         
         if vitals.heartRate and vitals.heartRate > 120:
-            recommendations.append("Consider ECG monitoring and cardiac assessment")
+            recommendations.append(CARDIAC_RECOMMENDATION)
         
         if vitals.systolicBP and vitals.systolicBP < 90:
-            recommendations.append("Assess fluid status and consider fluid resuscitation")
+            recommendations.append(FLUID_RECOMMENDATION)
         
-        return recommendations[:8]  # Limit to 8 recommendations
+        return recommendations[:MAX_RECOMMENDATIONS]
     
     def get_all_rules(self) -> Dict:
         """Return all explainable rules used in the system"""
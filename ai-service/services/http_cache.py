@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import zstandard
+except ImportError:  # zstd variants are only offered when zstandard is installed
+    zstandard = None
+
+# Content codings served from cache, preferred first on equal q
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda body: zstandard.ZstdCompressor(level=10).compress(body)
+COMPRESSORS["gzip"] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class CachedBody:
+    """
+    A JSON response body serialized once, with a strong ETag per
+    representation. Each compressed variant is built the first time a
+    client accepts it and reused after that, so serving is a header check
+    plus a bytes write.
+    """
+
+    def __init__(self, content: Any):
+        self.content = content
+        # Same encoding FastAPI's JSONResponse uses
+        self.body = json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":")
+        ).encode("utf-8")
+        self.digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{self.digest}"'
+        self._variants: Dict[str, bytes] = {}
+
+    def respond(self, request: Request) -> Response:
+        """304 when the client already has the representation it would be sent, else that representation"""
+        encoding = self.select_encoding(request.headers.get("accept-encoding", ""))
+        etag = self.etag_for(encoding)
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding", "ETag": etag}
+
+        if _matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is None:
+            return Response(content=self.body, media_type="application/json", headers=headers)
+        return Response(
+            content=self.variant(encoding),
+            media_type="application/json",
+            headers={**headers, "Content-Encoding": encoding}
+        )
+
+    def select_encoding(self, accept_encoding: str) -> Optional[str]:
+        """Best compressed encoding the client accepts, None for the uncompressed body"""
+        accepted = _accepted_encodings(accept_encoding)
+        offered = [encoding for encoding in COMPRESSORS if encoding in accepted]
+        if not offered:
+            return None
+        # Highest q wins; on a tie COMPRESSORS order (smaller output first) decides
+        return max(offered, key=lambda name: accepted[name])
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'"{self.digest}-{encoding}"'
+
+    def variant(self, encoding: str) -> bytes:
+        """The body compressed with `encoding`, built on first use"""
+        body = self._variants.get(encoding)
+        if body is None:
+            body = self._variants[encoding] = COMPRESSORS[encoding](self.body)
+        return body
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check against one representation's ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}, codings with q=0 left out"""
+    qualities, wildcard = {}, None
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        coding = coding.lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding == "*":
+            wildcard = quality
+        else:
+            qualities[coding] = quality
+    if wildcard is not None:
+        for coding in COMPRESSORS:
+            qualities.setdefault(coding, wildcard)
+    return {coding: quality for coding, quality in qualities.items() if quality > 0}
+
+
+class ResponseCache:
+    """
+    CachedBody per key. When the key's version changes the content is
+    rebuilt, but the cached body (and its ETag and compressed variants)
+    is kept if the content came out the same, so a version shared by many
+    keys does not invalidate them all. Bounded; the least recently used
+    key is evicted first.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> CachedBody:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        content = build()
+        if entry is not None and entry[1].content == content:
+            cached = entry[1]
+        else:
+            cached = CachedBody(content)
+        self._entries[key] = (version, cached)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cached
+
+
+class BatchGZipMiddleware:
+    """
+    Streaming gzip for large POST (batch) responses only. Cached GET
+    bodies are already compressed and must not be encoded twice.
+    """
+
+    def __init__(self, app, paths: Iterable[str], minimum_size: int = 1024):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths:
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
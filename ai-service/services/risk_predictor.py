@@ -3,6 +3,8 @@ from typing import List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 
+from services.trend_engine import TrendEngine
+
 class VitalSigns(BaseModel):
     heartRate: Optional[float] = None
     systolicBP: Optional[float] = None
@@ -11,6 +13,23 @@ class VitalSigns(BaseModel):
     respiratoryRate: Optional[float] = None
     temperature: Optional[float] = None
 
+# Column order used by the vectorized scoring functions
+VITAL_ORDER = (
+    'heartRate',
+    'systolicBP',
+    'diastolicBP',
+    'oxygenSaturation',
+    'respiratoryRate',
+    'temperature'
+)
+
+# Score at which each risk level starts
+RISK_LEVEL_THRESHOLDS = (
+    ('medium', 25),
+    ('high', 50),
+    ('critical', 75)
+)
+
 class RiskPredictor:
     """
     Risk prediction using rule-based logic + simple ML scoring
@@ -35,23 +54,33 @@ class RiskPredictor:
             'respiratoryRate': 0.15,
             'temperature': 0.10
         }
+        self.trend_engine = TrendEngine(VITAL_ORDER, self.normal_ranges)
+        self.component_weights = np.array([
+            self.risk_weights['heartRate'],
+            self.risk_weights['bloodPressure'],
+            self.risk_weights['oxygenSaturation'],
+            self.risk_weights['respiratoryRate'],
+            self.risk_weights['temperature']
+        ])
     
     def calculate_risk(
         self,
         vitals: VitalSigns,
         age: Optional[int] = None,
         medical_history: List[str] = [],
-        historical_vitals: List[VitalSigns] = []
+        historical_vitals: List[VitalSigns] = [],
+        trend_risk: Optional[float] = None
     ) -> Tuple[float, str, List[str]]:
         """
         Calculate risk score (0-100) and risk level
+        trend_risk: precomputed trend risk (e.g. from batch_trend_risk)
         Returns: (risk_score, risk_level, contributing_factors)
         """
         risk_score = 0.0
         contributing_factors = []
         
         # 1. Heart Rate Analysis
-        if vitals.heartRate:
+        if vitals.heartRate is not None:
             hr_risk = self._assess_heart_rate(vitals.heartRate, age)
             risk_score += hr_risk * self.risk_weights['heartRate']
             if hr_risk > 50:
@@ -60,7 +89,7 @@ class RiskPredictor:
                 )
         
         # 2. Blood Pressure Analysis
-        if vitals.systolicBP and vitals.diastolicBP:
+        if vitals.systolicBP is not None and vitals.diastolicBP is not None:
             bp_risk = self._assess_blood_pressure(vitals.systolicBP, vitals.diastolicBP)
             risk_score += bp_risk * self.risk_weights['bloodPressure']
             if bp_risk > 50:
@@ -69,7 +98,7 @@ class RiskPredictor:
                 )
         
         # 3. Oxygen Saturation Analysis
-        if vitals.oxygenSaturation:
+        if vitals.oxygenSaturation is not None:
             spo2_risk = self._assess_oxygen_saturation(vitals.oxygenSaturation)
             risk_score += spo2_risk * self.risk_weights['oxygenSaturation']
             if spo2_risk > 50:
@@ -78,7 +107,7 @@ class RiskPredictor:
                 )
         
         # 4. Respiratory Rate Analysis
-        if vitals.respiratoryRate:
+        if vitals.respiratoryRate is not None:
             rr_risk = self._assess_respiratory_rate(vitals.respiratoryRate)
             risk_score += rr_risk * self.risk_weights['respiratoryRate']
             if rr_risk > 50:
@@ -87,7 +116,7 @@ class RiskPredictor:
                 )
         
         # 5. Temperature Analysis
-        if vitals.temperature:
+        if vitals.temperature is not None:
             temp_risk = self._assess_temperature(vitals.temperature)
             risk_score += temp_risk * self.risk_weights['temperature']
             if temp_risk > 50:
@@ -96,8 +125,9 @@ class RiskPredictor:
                 )
         
         # 6. Trend Analysis (if historical data available)
-        if historical_vitals and len(historical_vitals) > 1:
-            trend_risk = self._analyze_trends(vitals, historical_vitals)
+        if trend_risk is None:
+            trend_risk = self.trend_risk(vitals, historical_vitals)
+        if trend_risk:
             risk_score += trend_risk * 0.15
             if trend_risk > 30:
                 contributing_factors.append("Deteriorating trend detected in vital signs")
@@ -109,17 +139,101 @@ class RiskPredictor:
         # Normalize risk score to 0-100
         risk_score = min(100, max(0, risk_score))
         
-        # Determine risk level
-        if risk_score >= 75:
-            risk_level = "critical"
-        elif risk_score >= 50:
-            risk_level = "high"
-        elif risk_score >= 25:
-            risk_level = "medium"
-        else:
-            risk_level = "low"
+        return risk_score, self.risk_level(risk_score), contributing_factors
+    
+    def risk_level(self, risk_score: float) -> str:
+        """Map a 0-100 risk score to its risk level"""
+        level = "low"
+        for name, threshold in RISK_LEVEL_THRESHOLDS:
+            if risk_score >= threshold:
+                level = name
+        return level
+    
+    def context_risk(
+        self,
+        vitals: VitalSigns,
+        medical_history: List[str] = [],
+        historical_vitals: List[VitalSigns] = []
+    ) -> float:
+        """Weighted trend and medical-history contribution to the risk score"""
+        return (
+            self._assess_medical_history(medical_history) * 0.10
+            + self.trend_risk(vitals, historical_vitals) * 0.15
+        )
+    
+    def trend_risk(self, vitals: VitalSigns, historical_vitals: List[VitalSigns] = []) -> float:
+        """Unweighted trend risk (0-100); 0 without enough history"""
+        if historical_vitals and len(historical_vitals) > 1:
+            return self._analyze_trends(vitals, historical_vitals)
+        return 0.0
+    
+    def batch_trend_risk(
+        self,
+        vitals_list: List[VitalSigns],
+        historical_list: List[List[VitalSigns]]
+    ) -> np.ndarray:
+        """trend_risk for many patients in one (patients x time) pass"""
+        risks = np.zeros(len(vitals_list))
+        eligible = [
+            i for i, historical in enumerate(historical_list)
+            if historical and len(historical) > 1
+        ]
+        if eligible:
+            windows = self.trend_engine.stack([
+                self.trend_engine.to_array(vitals_list[i], historical_list[i]) for i in eligible
+            ])
+            risks[eligible] = self.trend_engine.trend_risk(windows)
+        return risks
+    
+    def vitals_to_array(self, vitals: VitalSigns) -> np.ndarray:
+        """Vitals as a float array in VITAL_ORDER, NaN where missing"""
+        return np.array([
+            np.nan if getattr(vitals, name) is None else getattr(vitals, name)
+            for name in VITAL_ORDER
+        ], dtype=float)
+    
+    def score_components(self, values: np.ndarray, usable: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Vectorized per-vital risk (0-100 scale, before weighting).
+        values: (..., 6) array in VITAL_ORDER, NaN where missing.
+        usable: optional mask from SignalQualityFilter; False readings are ignored.
+        Returns (..., 5): heart rate, blood pressure, SpO2, respiratory rate, temperature.
+        """
+        values = np.asarray(values, dtype=float)
+        present = np.isfinite(values)
+        if usable is not None:
+            present &= usable
+        hr, sys_bp, dia_bp, spo2, rr, temp = np.moveaxis(values, -1, 0)
+        
+        components = np.stack([
+            self._assess_heart_rate_array(hr),
+            self._assess_blood_pressure_array(sys_bp, dia_bp),
+            self._assess_oxygen_saturation_array(spo2),
+            self._assess_respiratory_rate_array(rr),
+            self._assess_temperature_array(temp)
+        ], axis=-1)
+        component_present = np.stack([
+            present[..., 0],
+            present[..., 1] & present[..., 2],
+            present[..., 3],
+            present[..., 4],
+            present[..., 5]
+        ], axis=-1)
         
-        return risk_score, risk_level, contributing_factors
+        return np.where(component_present, components, 0.0)
+    
+    def score_matrix(
+        self,
+        values: np.ndarray,
+        context_risk=0.0,
+        usable: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Vectorized equivalent of the vital-sign part of calculate_risk.
+        context_risk (scalar or broadcastable array) adds trend/history risk.
+        """
+        weighted = self.score_components(values, usable) @ self.component_weights
+        return np.clip(weighted + context_risk, 0, 100)
     
     def _assess_heart_rate(self, hr: float, age: Optional[int] = None) -> float:
         """Assess heart rate risk (0-100)"""
@@ -204,29 +318,67 @@ class RiskPredictor:
         else:
             return 20 + (normal_min - temp) * 5
     
+    def _assess_heart_rate_array(self, hr: np.ndarray) -> np.ndarray:
+        normal_min, normal_max = self.normal_ranges['heartRate']
+        return np.select(
+            [(hr >= normal_min) & (hr <= normal_max), hr < 50, hr > 120, hr > 100],
+            [0.0, 60 + (50 - hr) * 2, 50 + (hr - 120) * 1.5, 30 + (hr - 100) * 1.0],
+            default=20 + (normal_min - hr) * 1.0
+        )
+    
+    def _assess_blood_pressure_array(self, systolic: np.ndarray, diastolic: np.ndarray) -> np.ndarray:
+        normal_sys_min, normal_sys_max = self.normal_ranges['systolicBP']
+        normal_dia_min, normal_dia_max = self.normal_ranges['diastolicBP']
+        
+        systolic_risk = np.select(
+            [systolic < normal_sys_min, systolic > normal_sys_max],
+            [
+                40 + (normal_sys_min - systolic) * 2,
+                30 + (systolic - normal_sys_max) * 1.5 + np.where(systolic > 180, 30, 0)
+            ],
+            default=0.0
+        )
+        diastolic_risk = np.select(
+            [diastolic < normal_dia_min, diastolic > normal_dia_max],
+            [
+                30 + (normal_dia_min - diastolic) * 2,
+                25 + (diastolic - normal_dia_max) * 1.5 + np.where(diastolic > 120, 25, 0)
+            ],
+            default=0.0
+        )
+        return np.minimum(100, systolic_risk + diastolic_risk)
+    
+    def _assess_oxygen_saturation_array(self, spo2: np.ndarray) -> np.ndarray:
+        normal_min, _ = self.normal_ranges['oxygenSaturation']
+        return np.select(
+            [spo2 >= normal_min, spo2 >= 90, spo2 >= 85],
+            [0.0, 30 + (normal_min - spo2) * 3, 60 + (90 - spo2) * 4],
+            default=90 + (85 - spo2) * 5
+        )
+    
+    def _assess_respiratory_rate_array(self, rr: np.ndarray) -> np.ndarray:
+        normal_min, normal_max = self.normal_ranges['respiratoryRate']
+        return np.select(
+            [(rr >= normal_min) & (rr <= normal_max), rr < 10, rr > 25, rr > normal_max],
+            [0.0, 50 + (10 - rr) * 5, 40 + (rr - 25) * 2, 20 + (rr - normal_max) * 1.5],
+            default=15 + (normal_min - rr) * 1.5
+        )
+    
+    def _assess_temperature_array(self, temp: np.ndarray) -> np.ndarray:
+        normal_min, normal_max = self.normal_ranges['temperature']
+        return np.select(
+            [(temp >= normal_min) & (temp <= normal_max), temp > 102, temp > normal_max, temp < 95],
+            [0.0, 60 + (temp - 102) * 10, 30 + (temp - normal_max) * 5, 70 + (95 - temp) * 10],
+            default=20 + (normal_min - temp) * 5
+        )
+    
     def _analyze_trends(self, current: VitalSigns, historical: List[VitalSigns]) -> float:
-        """Analyze trends in vital signs"""
+        """Analyze trends in vital signs over the whole historical window"""
         if not historical:
             return 0
         
-        risk = 0
-        
-        # Check for deteriorating trends
-        if current.heartRate and historical[-1].heartRate:
-            if current.heartRate > historical[-1].heartRate + 10:
-                risk += 20
-            elif current.heartRate < historical[-1].heartRate - 10:
-                risk += 15
-        
-        if current.oxygenSaturation and historical[-1].oxygenSaturation:
-            if current.oxygenSaturation < historical[-1].oxygenSaturation - 3:
-                risk += 30  # Significant drop in SpO2
-        
-        if current.systolicBP and historical[-1].systolicBP:
-            if current.systolicBP < historical[-1].systolicBP - 20:
-                risk += 25  # Significant BP drop
-        
-        return min(100, risk)
+        window = self.trend_engine.to_array(current, historical)
+        return float(self.trend_engine.trend_risk(window))
     
     def _assess_medical_history(self, history: List[str]) -> float:
         """Assess risk based on medical history"""
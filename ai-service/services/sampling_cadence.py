@@ -0,0 +1,102 @@
+import time
+from typing import Dict, List, Optional
+
+from services.risk_predictor import RISK_LEVEL_THRESHOLDS
+from services.signal_quality import QUALITY_LABELS, SPIKE
+
+# Fixed interval the vitals feed uses today (dataSimulator.js, bedside monitors)
+DEFAULT_INTERVAL_SECONDS = 4.0
+
+# Recommended seconds between readings for each risk level
+LEVEL_INTERVALS = {
+    "critical": 2.0,
+    "high": 4.0,
+    "medium": 15.0,
+    "low": 60.0
+}
+LEVEL_ORDER = ("low", "medium", "high", "critical")
+
+MIN_INTERVAL_SECONDS = 2.0
+MAX_INTERVAL_SECONDS = 60.0
+
+# Within this many risk points of the next level, sample at that level's cadence
+THRESHOLD_MARGIN = 5.0
+# Trend risk above which a patient is treated as deteriorating (same cut-off as the trend factor)
+DETERIORATING_TREND_RISK = 30.0
+SPIKE_FLAG = QUALITY_LABELS[SPIKE]
+
+
+class SamplingCadence:
+    """
+    Recommend how often a bed should send vitals: stable low-risk patients
+    can back off, deteriorating or near-threshold patients are tightened,
+    and a spike flagged by the quality stage is re-sampled at once.
+    """
+
+    def recommend_interval(
+        self,
+        risk_score: float,
+        risk_level: str,
+        trend_risk: float = 0.0,
+        quality_flags: Optional[Dict[str, str]] = None
+    ) -> float:
+        """Recommended seconds until the next reading"""
+        # An unconfirmed jump may be real deterioration: confirm it as soon as possible
+        if quality_flags and SPIKE_FLAG in quality_flags.values():
+            return MIN_INTERVAL_SECONDS
+
+        interval = LEVEL_INTERVALS.get(risk_level, DEFAULT_INTERVAL_SECONDS)
+
+        # Close to the next boundary up: sample as if already there
+        for level, threshold in RISK_LEVEL_THRESHOLDS:
+            if risk_score < threshold <= risk_score + THRESHOLD_MARGIN:
+                interval = min(interval, LEVEL_INTERVALS[level])
+                break
+
+        # Deteriorating: one level tighter than the score alone suggests
+        if trend_risk > DETERIORATING_TREND_RISK:
+            index = LEVEL_ORDER.index(risk_level) if risk_level in LEVEL_ORDER else 0
+            tighter = LEVEL_ORDER[min(index + 1, len(LEVEL_ORDER) - 1)]
+            interval = min(interval, LEVEL_INTERVALS[tighter])
+
+        return max(MIN_INTERVAL_SECONDS, min(MAX_INTERVAL_SECONDS, interval))
+
+    def ward_plan(self, patients: List[Dict], now: Optional[float] = None) -> Dict:
+        """
+        Cadence for a set of patients plus ingest totals.
+        Each patient dict needs patientId, riskScore, riskLevel,
+        recommendedSampleInterval and lastSampleAt (epoch seconds or NaN).
+        """
+        now = time.time() if now is None else now
+        results = []
+        recommended_per_minute = 0.0
+
+        for patient in patients:
+            interval = patient["recommendedSampleInterval"]
+            recommended_per_minute += 60.0 / interval
+
+            last_sample = patient.get("lastSampleAt")
+            staleness = None
+            if last_sample is not None and last_sample == last_sample:  # not NaN
+                staleness = round(max(0.0, now - last_sample), 1)
+
+            results.append({
+                "patientId": patient["patientId"],
+                "riskScore": patient["riskScore"],
+                "riskLevel": patient["riskLevel"],
+                "recommendedSampleInterval": interval,
+                "stalenessSeconds": staleness,
+                "overdue": staleness is not None and staleness > interval
+            })
+
+        current_per_minute = len(patients) * 60.0 / DEFAULT_INTERVAL_SECONDS
+        return {
+            "patients": results,
+            "total": len(results),
+            "ingest": {
+                "currentReadingsPerMinute": round(current_per_minute, 1),
+                "recommendedReadingsPerMinute": round(recommended_per_minute, 1),
+                "reduction": round(1 - recommended_per_minute / current_per_minute, 3) if current_per_minute else 0.0
+            },
+            "overdue": sum(1 for result in results if result["overdue"])
+        }
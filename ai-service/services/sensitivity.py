@@ -0,0 +1,114 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from services.risk_predictor import RiskPredictor, RISK_LEVEL_THRESHOLDS, VITAL_ORDER
+
+# Perturbation step per vital; every vital gets the same number of steps
+# either side of its baseline so the grid is one dense (vital, step) block
+PERTURBATION_STEPS = {
+    'heartRate': 1.0,
+    'systolicBP': 1.0,
+    'diastolicBP': 1.0,
+    'oxygenSaturation': 0.25,
+    'respiratoryRate': 0.5,
+    'temperature': 0.05
+}
+STEPS_PER_SIDE = 120
+
+
+class SensitivityAnalyzer:
+    """
+    What-if analysis: how far each vital is from moving the patient
+    across a risk level boundary, and how much it contributes now.
+    """
+
+    def __init__(self, risk_predictor: RiskPredictor, steps_per_side: int = STEPS_PER_SIDE):
+        self.risk_predictor = risk_predictor
+        n_vitals = len(VITAL_ORDER)
+
+        step_sizes = np.array([PERTURBATION_STEPS[name] for name in VITAL_ORDER])
+        steps = np.arange(-steps_per_side, steps_per_side + 1)
+        # offsets[v, k] is the k-th perturbation of vital v
+        self.offsets = step_sizes[:, None] * steps[None, :]
+
+        # grid[v, k] perturbs only vital v; built once, only the baseline changes per patient
+        self.grid = np.zeros((n_vitals, steps.size, n_vitals))
+        self.grid[np.arange(n_vitals), :, np.arange(n_vitals)] = self.offsets
+        self.grid.setflags(write=False)
+
+        self.thresholds = np.array([threshold for _, threshold in RISK_LEVEL_THRESHOLDS], dtype=float)
+        self._center = steps_per_side
+
+    def analyze(self, baseline: np.ndarray, context_risk: float = 0.0) -> Dict:
+        """
+        baseline: vitals in VITAL_ORDER (NaN where missing).
+        context_risk: trend/history contribution, held fixed across the grid.
+        """
+        baseline = np.asarray(baseline, dtype=float)
+        perturbed = baseline + self.grid
+        scores = self.risk_predictor.score_matrix(perturbed, context_risk)
+        base_score = scores[0, self._center]
+
+        weighted = self.risk_predictor.score_components(baseline) * self.risk_predictor.component_weights
+        contributions = self._vital_contributions(weighted)
+
+        # crossed[b, v, k]: perturbation k of vital v puts the score on the other side of boundary b
+        base_above = base_score >= self.thresholds
+        crossed = (scores[None, :, :] >= self.thresholds[:, None, None]) != base_above[:, None, None]
+        crossed &= self._plausible(perturbed)[None, :, :]
+        increase = _nearest(np.where(crossed & (self.offsets > 0), self.offsets, np.inf), np.min)
+        decrease = _nearest(np.where(crossed & (self.offsets < 0), self.offsets, -np.inf), np.max)
+
+        # Central difference around the baseline: risk points per unit change
+        step = self.offsets[:, self._center + 1]
+        slope = (scores[:, self._center + 1] - scores[:, self._center - 1]) / (2 * step)
+
+        vitals = {}
+        for v, name in enumerate(VITAL_ORDER):
+            if np.isnan(baseline[v]):
+                continue
+            vitals[name] = {
+                "value": float(baseline[v]),
+                "contribution": round(float(contributions[v]), 2),
+                "sensitivity": round(float(slope[v]), 3),
+                "boundaries": {
+                    level: {
+                        "increase": _round_or_none(increase[b, v]),
+                        "decrease": _round_or_none(decrease[b, v])
+                    }
+                    for b, (level, _) in enumerate(RISK_LEVEL_THRESHOLDS)
+                }
+            }
+
+        return {
+            "riskScore": round(float(base_score), 2),
+            "riskLevel": self.risk_predictor.risk_level(base_score),
+            "scoreToBoundary": {
+                level: round(float(threshold - base_score), 2)
+                for level, threshold in RISK_LEVEL_THRESHOLDS
+            },
+            "contextRisk": round(float(context_risk), 2),
+            "vitals": vitals
+        }
+
+    def _plausible(self, perturbed: np.ndarray) -> np.ndarray:
+        # Only the perturbed vital matters in each row; discard non-physical values
+        values = perturbed[np.arange(len(VITAL_ORDER)), :, np.arange(len(VITAL_ORDER))]
+        plausible = values > 0
+        plausible[VITAL_ORDER.index('oxygenSaturation')] &= values[VITAL_ORDER.index('oxygenSaturation')] <= 100
+        return plausible
+
+    def _vital_contributions(self, weighted: np.ndarray) -> np.ndarray:
+        # Blood pressure is scored jointly; split its points evenly between systolic and diastolic
+        hr, bp, spo2, rr, temp = weighted
+        return np.array([hr, bp / 2, bp / 2, spo2, rr, temp])
+
+
+def _nearest(values: np.ndarray, reduce) -> np.ndarray:
+    nearest = reduce(values, axis=-1)
+    return np.where(np.isfinite(nearest), nearest, np.nan)
+
+
+def _round_or_none(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
@@ -0,0 +1,403 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized per process only
+    fcntl = None
+
+# Columns held for every patient, in storage order
+VITAL_COLUMNS = (
+    'heartRate',
+    'systolicBP',
+    'diastolicBP',
+    'oxygenSaturation',
+    'respiratoryRate',
+    'temperature'
+)
+ROSTER_COLUMNS = VITAL_COLUMNS + ('riskScore', 'riskLevel', 'vitalsTimestamp', 'updatedAt')
+COLUMN_INDEX = {name: i for i, name in enumerate(ROSTER_COLUMNS)}
+
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+RISK_LEVEL_CODES = {level: float(i) for i, level in enumerate(RISK_LEVELS)}
+
+HEADER_DTYPE = np.dtype([
+    ('count', '<u8'),
+    ('version', '<u8'),
+    ('capacity', '<u8'),
+    ('snapshotVersion', '<u8'),
+    ('_reserved', '<u8', (4,))
+])
+ROW_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('patientId', 'S64'),
+    ('wardId', 'S32'),
+    ('values', '<f8', (len(ROSTER_COLUMNS),))
+])
+
+# Seconds to wait for another worker to finish creating the segment
+ATTACH_TIMEOUT = 5.0
+# Re-reads of a row caught mid-write before the reader suspects a dead writer
+MAX_READ_RETRIES = 1000
+
+PATIENT_ID_BYTES = ROW_DTYPE['patientId'].itemsize
+WARD_ID_BYTES = ROW_DTYPE['wardId'].itemsize
+
+
+class SharedRoster:
+    """
+    Current ward/patient state held in shared memory so every uvicorn
+    worker reads the same copy.
+
+    Each row is guarded by a sequence counter (seqlock): the writer makes
+    it odd while a row is being written and even again once it is done.
+    Readers never block; they copy the rows and re-read any row whose
+    counter changed or was odd during the copy. A row left odd by a writer
+    that died mid-write is repaired by the next reader that finds it so. Writers from different
+    workers are serialized through an advisory file lock so there is only
+    ever one writer at a time.
+
+    The roster is a cache of the latest state: once it is full, a new
+    patient takes over the row that was updated longest ago.
+    """
+
+    def __init__(self, name: str = "mediq_roster", capacity: int = 4096, journal=None):
+        self.name = name
+        # Optional sink with append(rows); receives each written row under the writer lock
+        self.journal = journal
+        self._local_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+        # Creating or attaching under the writer lock means no worker can see
+        # the segment before its creator has sized it and written the header
+        with self.writer():
+            self._shm = self._open_segment(name, capacity)
+
+        self.capacity = int(self._header['capacity'][0])
+        self._rows = np.ndarray(
+            (self.capacity,),
+            dtype=ROW_DTYPE,
+            buffer=self._shm.buf,
+            offset=HEADER_DTYPE.itemsize
+        )
+        self._slots: Dict[str, int] = {}
+
+    def _open_segment(self, name: str, capacity: int) -> shared_memory.SharedMemory:
+        size = HEADER_DTYPE.itemsize + ROW_DTYPE.itemsize * capacity
+        deadline = time.monotonic() + ATTACH_TIMEOUT
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                created = True
+            except FileExistsError:
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                    created = False
+                except ValueError:
+                    # Exists but not sized yet by a creator that does not hold the lock
+                    shm = None
+
+            if shm is not None:
+                # The segment outlives any single worker; it is removed with unlink()
+                resource_tracker.unregister(shm._name, "shared_memory")
+                self._header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)
+                if created:
+                    self._header['capacity'] = capacity
+                if self._header['capacity'][0] > 0:
+                    return shm
+                self._header = None
+                shm.close()
+
+            if time.monotonic() > deadline:
+                raise OSError(f"Shared roster {name} was never initialized")
+            time.sleep(0.01)
+
+    @property
+    def version(self) -> int:
+        """Incremented on every write; cheap change detection for readers"""
+        return int(self._header['version'][0])
+
+    @property
+    def snapshot_version(self) -> int:
+        """Roster version captured by the most recent persisted snapshot"""
+        return int(self._header['snapshotVersion'][0])
+
+    @snapshot_version.setter
+    def snapshot_version(self, value: int) -> None:
+        self._header['snapshotVersion'] = value
+
+    def __len__(self) -> int:
+        return int(self._header['count'][0])
+
+    @contextmanager
+    def writer(self):
+        """Hold the single-writer lock shared by all workers"""
+        with self._local_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(
+        self,
+        patient_id: str,
+        vitals: Dict,
+        risk_score: float,
+        risk_level: str,
+        ward_id: Optional[str] = None,
+        vitals_timestamp: Optional[str] = None,
+        only_newer: bool = False
+    ) -> bool:
+        """
+        Publish the latest vitals and risk for a patient. With only_newer,
+        a patient already in the roster is only overwritten by a reading
+        with a later vitals timestamp. Returns whether the row was written.
+        """
+        values = np.full(len(ROSTER_COLUMNS), np.nan)
+        for i, column in enumerate(VITAL_COLUMNS):
+            value = vitals.get(column)
+            if value is not None:
+                values[i] = value
+        values[COLUMN_INDEX['riskScore']] = risk_score
+        values[COLUMN_INDEX['riskLevel']] = RISK_LEVEL_CODES.get(risk_level, np.nan)
+        values[COLUMN_INDEX['vitalsTimestamp']] = parse_timestamp(vitals_timestamp)
+        values[COLUMN_INDEX['updatedAt']] = time.time()
+
+        ward_key = _key(ward_id, WARD_ID_BYTES) if ward_id is not None else None
+        with self.writer():
+            if only_newer:
+                slot = self._find_slot(patient_id, create=False)
+                if slot is not None and not _is_newer(values, self._rows['values'][slot]):
+                    return False
+            slot = self._find_slot(patient_id, create=True)
+            row = self._rows[slot:slot + 1]
+            _begin_write(row)
+            if ward_key is not None:
+                row['wardId'] = ward_key
+            row['values'] = values
+            _end_write(row)
+            self._header['version'] += 1
+            if self.journal is not None:
+                self.journal.append(row)
+        return True
+
+    def restore(self, rows: np.ndarray) -> int:
+        """
+        Merge persisted rows (ROW_DTYPE), keeping whichever copy of each
+        patient was updated most recently. Returns the number applied.
+        """
+        updated_at = COLUMN_INDEX['updatedAt']
+        applied = 0
+        with self.writer():
+            for record in rows:
+                patient_id = _decode(record['patientId'])
+                if not patient_id:
+                    continue
+                slot = self._find_slot(patient_id, create=True)
+                row = self._rows[slot:slot + 1]
+                # NaN (never written) compares False, so persisted data wins
+                if row['values'][0][updated_at] >= record['values'][updated_at]:
+                    continue
+                _begin_write(row)
+                row['wardId'] = record['wardId']
+                row['values'] = record['values']
+                _end_write(row)
+                applied += 1
+            if applied:
+                self._header['version'] += 1
+        return applied
+
+    def get(self, patient_id: str) -> Optional[Dict]:
+        """Consistent read of one patient's current state"""
+        if len(patient_id.encode()) > PATIENT_ID_BYTES:
+            return None  # Never stored; see _key()
+        key = _key(patient_id, PATIENT_ID_BYTES)
+        for _ in range(2):
+            slot = self._find_slot(patient_id, create=False)
+            if slot is None:
+                return None
+            record = self._read_row(slot)
+            if record['patientId'] == key:
+                return _to_dict(record)
+            # The row was reclaimed for another patient between lookup and read
+            self._slots.pop(patient_id, None)
+        return None
+
+    def read_rows(self) -> np.ndarray:
+        """
+        Consistent copy of every occupied row. Only rows torn by a
+        concurrent write are copied again.
+        """
+        count = len(self)
+        seq_before = self._rows['seq'][:count].copy()
+        rows = self._rows[:count].copy()
+        torn = np.flatnonzero((seq_before != self._rows['seq'][:count]) | (seq_before % 2 == 1))
+
+        for attempt in range(MAX_READ_RETRIES):
+            if not torn.size:
+                return rows
+            if attempt:
+                time.sleep(0)  # let the writer finish
+            seq_before = self._rows['seq'][torn].copy()
+            rows[torn] = self._rows[torn]
+            torn = torn[(seq_before != self._rows['seq'][torn]) | (seq_before % 2 == 1)]
+
+        if torn.size:
+            self._repair(torn)
+            rows[torn] = self._rows[torn]
+        return rows
+
+    def snapshot(self, ward_id: Optional[str] = None) -> List[Dict]:
+        """Current state of every patient, optionally limited to one ward"""
+        rows = self.read_rows()
+        if ward_id is not None:
+            if len(ward_id.encode()) > WARD_ID_BYTES:
+                return []
+            rows = rows[rows['wardId'] == _key(ward_id, WARD_ID_BYTES)]
+        return [_to_dict(record) for record in rows]
+
+    def close(self) -> None:
+        self._header = None
+        self._rows = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Remove the shared segment; call once when the service shuts down for good"""
+        # SharedMemory.unlink() unregisters from the resource tracker itself
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+
+    def _read_row(self, slot: int) -> np.ndarray:
+        for attempt in range(MAX_READ_RETRIES):
+            before = int(self._rows['seq'][slot])
+            record = self._rows[slot].copy()
+            if before % 2 == 0 and before == int(self._rows['seq'][slot]):
+                return record
+            if attempt:
+                time.sleep(0)
+        self._repair(np.array([slot]))
+        return self._rows[slot].copy()
+
+    def _repair(self, slots: np.ndarray) -> None:
+        """
+        Close rows still odd after MAX_READ_RETRIES. Once the writer lock
+        is ours no write is in progress, so an odd counter can only be left
+        by a writer that died mid-write.
+        """
+        with self.writer():
+            stuck = slots[self._rows['seq'][slots] % 2 == 1]
+            self._rows['seq'][stuck] += 1
+
+    def _find_slot(self, patient_id: str, create: bool) -> Optional[int]:
+        slot = self._slots.get(patient_id)
+        key = _key(patient_id, PATIENT_ID_BYTES)
+        # A cached slot is only trusted while the shared id column still agrees
+        if slot is not None and self._rows['patientId'][slot] == key:
+            return slot
+
+        count = len(self)
+        matches = np.flatnonzero(self._rows['patientId'][:count] == key)
+        if matches.size:
+            slot = int(matches[0])
+        elif create:
+            if count < self.capacity:
+                slot = count
+                self._header['count'] = count + 1
+            else:
+                slot = self._stalest_slot()
+            row = self._rows[slot:slot + 1]
+            _begin_write(row)
+            row['patientId'] = key
+            row['wardId'] = b""
+            row['values'] = np.nan
+            _end_write(row)
+        else:
+            return None
+
+        self._slots[patient_id] = slot
+        return slot
+
+    def _stalest_slot(self) -> int:
+        """Row to reclaim when the roster is full: the least recently updated"""
+        updated_at = self._rows['values'][:, COLUMN_INDEX['updatedAt']]
+        # Rows claimed but never written (NaN) go first
+        return int(np.argmin(np.nan_to_num(updated_at, nan=-np.inf)))
+
+
+def _key(value: Optional[str], width: int) -> bytes:
+    """
+    Fixed-width column value. IDs that do not fit are rejected rather than
+    truncated: a truncated ID would share its row with every other ID
+    that has the same prefix.
+    """
+    encoded = (value or "").encode()
+    if len(encoded) > width:
+        raise ValueError(f"{value[:20]}... is longer than {width} bytes")
+    return encoded
+
+
+def _decode(value: bytes) -> str:
+    return value.decode(errors='replace')
+
+
+def _begin_write(row: np.ndarray) -> None:
+    # Set odd rather than increment: a row left odd by a dead writer stays odd, not even
+    row['seq'] |= 1
+
+
+def _end_write(row: np.ndarray) -> None:
+    row['seq'] += 1
+
+
+def _is_newer(values: np.ndarray, stored: np.ndarray) -> bool:
+    """Whether a reading replaces a stored row: it has a later vitals timestamp, or the row was never written"""
+    if np.isnan(stored[COLUMN_INDEX['updatedAt']]):
+        return True
+    timestamp, stored_timestamp = values[COLUMN_INDEX['vitalsTimestamp']], stored[COLUMN_INDEX['vitalsTimestamp']]
+    return bool(timestamp > stored_timestamp or (np.isnan(stored_timestamp) and not np.isnan(timestamp)))
+
+
+def parse_timestamp(value: Optional[str]) -> float:
+    """ISO-8601 timestamp to epoch seconds, NaN when missing or unparseable"""
+    if not value:
+        return np.nan
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _format_timestamp(value: float) -> Optional[str]:
+    if np.isnan(value):
+        return None
+    return datetime.fromtimestamp(value).isoformat()
+
+
+def _to_dict(record) -> Dict:
+    values = record['values']
+    level = values[COLUMN_INDEX['riskLevel']]
+    return {
+        "patientId": _decode(record['patientId']),
+        "wardId": _decode(record['wardId']) or None,
+        "riskScore": round(float(values[COLUMN_INDEX['riskScore']]), 2),
+        "riskLevel": None if np.isnan(level) else RISK_LEVELS[int(level)],
+        "vitals": {
+            column: None if np.isnan(values[i]) else float(values[i])
+            for i, column in enumerate(VITAL_COLUMNS)
+        },
+        "vitalsTimestamp": _format_timestamp(values[COLUMN_INDEX['vitalsTimestamp']]),
+        "updatedAt": _format_timestamp(values[COLUMN_INDEX['updatedAt']])
+    }
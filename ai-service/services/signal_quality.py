@@ -0,0 +1,151 @@
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.risk_predictor import VITAL_ORDER
+
+# Physiologically possible values; anything outside is a sensor fault.
+# A heart rate down to 0 is arrest or extreme bradycardia and must be scored.
+PLAUSIBLE_RANGES = {
+    'heartRate': (0, 300),
+    'systolicBP': (40, 300),
+    'diastolicBP': (15, 200),
+    'oxygenSaturation': (50, 100),
+    'respiratoryRate': (3, 70),
+    'temperature': (85, 110)  # Fahrenheit
+}
+
+# Largest believable jump from the patient's recent readings
+MAX_STEP = {
+    'heartRate': 40,
+    'systolicBP': 50,
+    'diastolicBP': 35,
+    'oxygenSaturation': 10,
+    'respiratoryRate': 15,
+    'temperature': 3
+}
+
+RECENT_WINDOW = 5
+
+# Quality codes, one per vital
+OK = 0
+MISSING = 1
+IMPLAUSIBLE = 2
+SPIKE = 3
+QUALITY_LABELS = {MISSING: "missing", IMPLAUSIBLE: "implausible", SPIKE: "spike"}
+
+
+class SignalQualityFilter:
+    """
+    Pre-scoring quality stage: marks each vital as usable, missing,
+    physiologically implausible (e.g. SpO2 40 from a loose probe) or a
+    spike relative to the patient's recent readings.
+
+    A jump is flagged as a spike while it is isolated: once the previous
+    reading agrees with it, the change is treated as real. Spikes are
+    still scored, because a real acute change looks exactly like one on
+    its first reading; the flag asks for a quick confirming reading
+    instead. Only missing and implausible readings are dropped.
+    """
+
+    def __init__(self):
+        self.lower = np.array([PLAUSIBLE_RANGES[name][0] for name in VITAL_ORDER], dtype=float)
+        self.upper = np.array([PLAUSIBLE_RANGES[name][1] for name in VITAL_ORDER], dtype=float)
+        self.max_step = np.array([MAX_STEP[name] for name in VITAL_ORDER], dtype=float)
+
+    def assess_batch(
+        self,
+        values: np.ndarray,
+        recent: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        values: (patients, 6) current readings in VITAL_ORDER, NaN where missing.
+        recent: optional (patients, time, 6) earlier readings, newest last.
+        Returns (usable mask, quality codes), both (patients, 6); spikes are usable.
+        """
+        values = np.asarray(values, dtype=float)
+        codes = np.full(values.shape, OK, dtype=np.int8)
+
+        missing = np.isnan(values)
+        implausible = ~missing & ((values < self.lower) | (values > self.upper))
+        codes[missing] = MISSING
+        codes[implausible] = IMPLAUSIBLE
+
+        if recent is not None and recent.shape[1]:
+            window = np.asarray(recent, dtype=float)[:, -RECENT_WINDOW:]
+            # Implausible history must not anchor the comparison
+            window = np.where((window >= self.lower) & (window <= self.upper), window, np.nan)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # no usable history
+                reference = np.nanmedian(window, axis=1)
+            previous = window[:, -1]
+
+            jump = np.abs(values - reference) > self.max_step
+            unconfirmed = ~(np.abs(values - previous) <= self.max_step)
+            spike = (codes == OK) & jump & unconfirmed
+            codes[spike] = SPIKE
+
+        return _usable(codes), codes
+
+    def assess(self, vitals, historical: List = []) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """
+        Single-patient form. Returns the usable readings by name (rejected
+        ones set to None) and a flag for each vital that is not OK.
+        """
+        values = np.array([[_value(vitals, name) for name in VITAL_ORDER]], dtype=float)
+        recent = None
+        if historical:
+            recent = np.array([
+                [[_value(reading, name) for name in VITAL_ORDER] for reading in historical[-RECENT_WINDOW:]]
+            ], dtype=float)
+        _, codes = self.assess_batch(values, recent)
+        return self.filtered(vitals, codes[0]), self.flags(codes[0])
+
+    def assess_many(
+        self,
+        vitals_list: List,
+        historical_list: List[List]
+    ) -> List[Tuple[Dict[str, Optional[float]], Dict[str, str]]]:
+        """assess() for many patients in one array pass"""
+        values = np.array(
+            [[_value(vitals, name) for name in VITAL_ORDER] for vitals in vitals_list],
+            dtype=float
+        ).reshape(len(vitals_list), len(VITAL_ORDER))
+        depth = max((len(historical[-RECENT_WINDOW:]) for historical in historical_list), default=0)
+        recent = np.full((len(vitals_list), depth, len(VITAL_ORDER)), np.nan)
+        for i, historical in enumerate(historical_list):
+            readings = historical[-RECENT_WINDOW:]
+            for j, reading in enumerate(readings, depth - len(readings)):
+                recent[i, j] = [_value(reading, name) for name in VITAL_ORDER]
+
+        _, codes = self.assess_batch(values, recent)
+        return [
+            (self.filtered(vitals, patient_codes), self.flags(patient_codes))
+            for vitals, patient_codes in zip(vitals_list, codes)
+        ]
+
+    def filtered(self, vitals, codes: np.ndarray) -> Dict[str, Optional[float]]:
+        """Readings with every rejected vital replaced by None"""
+        usable = _usable(codes)
+        return {
+            name: getattr(vitals, name) if usable[i] else None
+            for i, name in enumerate(VITAL_ORDER)
+        }
+
+    def flags(self, codes: np.ndarray) -> Dict[str, str]:
+        """Quality flag for every vital that is not OK, spikes included"""
+        return {
+            name: QUALITY_LABELS[int(code)]
+            for name, code in zip(VITAL_ORDER, codes)
+            if code != OK
+        }
+
+
+def _usable(codes: np.ndarray) -> np.ndarray:
+    return (codes == OK) | (codes == SPIKE)
+
+
+def _value(reading, name: str) -> float:
+    value = getattr(reading, name, None)
+    return np.nan if value is None else value
@@ -0,0 +1,159 @@
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from services.shared_roster import ROW_DTYPE, SharedRoster
+
+
+class StateStore:
+    """
+    Crash-safe persistence of the shared roster for warm restarts.
+
+    State is written as a periodic snapshot (a .npy file replaced
+    atomically) plus an append-only delta log of every row written since
+    that snapshot. On startup the snapshot is memory-mapped rather than
+    read, so only the pages actually touched are loaded, and the log is
+    replayed on top of it. A torn final log record from a crash is
+    ignored; replaying a log that predates the snapshot is harmless
+    because the most recently updated copy of each patient always wins.
+    """
+
+    SNAPSHOT_FILE = "roster.snapshot.npy"
+    LOG_FILE = "roster.delta.log"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+        self._log_lock = threading.Lock()
+        self._log_fd: Optional[int] = None
+
+    def attach(self, roster: SharedRoster) -> int:
+        """
+        Restore persisted state into the roster (unless a sibling worker
+        already did) and start journaling its writes. Returns the number
+        of patients restored.
+        """
+        restored = 0
+        if len(roster) == 0:
+            snapshot = self.load_snapshot()
+            if snapshot is not None:
+                restored += roster.restore(snapshot)
+            restored += roster.restore(self.load_log())
+            roster.snapshot_version = roster.version
+
+        with roster.writer():
+            self._drop_torn_record()
+            self._open_log()
+        roster.journal = self
+        return restored
+
+    def load_snapshot(self) -> Optional[np.ndarray]:
+        """Memory-map the last snapshot, or None when there is none"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        rows = np.load(self.snapshot_path, mmap_mode='r')
+        if rows.dtype != ROW_DTYPE:
+            return None
+        return rows
+
+    def load_log(self) -> np.ndarray:
+        """Rows appended since the last snapshot, in write order"""
+        if not os.path.exists(self.log_path):
+            return np.empty(0, dtype=ROW_DTYPE)
+        size = os.path.getsize(self.log_path)
+        complete = size // ROW_DTYPE.itemsize
+        if complete == 0:
+            return np.empty(0, dtype=ROW_DTYPE)
+        return np.memmap(self.log_path, dtype=ROW_DTYPE, mode='r', shape=(complete,))
+
+    def append(self, rows: np.ndarray) -> None:
+        """Journal written rows; called by the roster under its writer lock"""
+        if self._log_fd is None:
+            return
+        with self._log_lock:
+            os.write(self._log_fd, np.ascontiguousarray(rows, dtype=ROW_DTYPE).tobytes())
+
+    def snapshot(self, roster: SharedRoster, force: bool = False) -> bool:
+        """
+        Write a new snapshot and drop the log records it covers. Skipped
+        when no worker has written anything since the last snapshot.
+
+        The writer lock is only held to claim the version and, afterwards,
+        to trim the log; the rows are read and fsynced without it, so
+        writers never wait on disk I/O. Records appended while the snapshot
+        was being written are kept, since it may have missed them.
+        """
+        with roster.writer():
+            version = roster.version
+            if not force and version == roster.snapshot_version:
+                return False
+            # Claimed up front so sibling workers do not snapshot the same version
+            claimed_from = roster.snapshot_version
+            roster.snapshot_version = version
+            covered = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+        try:
+            rows = roster.read_rows()
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, rows)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._fsync_directory()
+        except BaseException:
+            # Not saved after all; the log still holds everything
+            with roster.writer():
+                if roster.snapshot_version == version:
+                    roster.snapshot_version = claimed_from
+            raise
+
+        with roster.writer(), self._log_lock:
+            self._drop_log_head(covered)
+        return True
+
+    def close(self) -> None:
+        with self._log_lock:
+            self._close_log()
+
+    def _drop_log_head(self, size: int) -> None:
+        # Rewritten in place: sibling workers keep appending through their own descriptors
+        if size == 0 or not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'r+b') as f:
+            f.seek(size)
+            tail = f.read()
+            f.seek(0)
+            f.write(tail)
+            f.truncate(len(tail))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_torn_record(self) -> None:
+        # Later appends must stay aligned to whole records
+        if os.path.exists(self.log_path):
+            size = os.path.getsize(self.log_path)
+            os.truncate(self.log_path, size - size % ROW_DTYPE.itemsize)
+
+    def _open_log(self) -> None:
+        if self._log_fd is None:
+            self._log_fd = os.open(self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _close_log(self) -> None:
+        if self._log_fd is not None:
+            os.fsync(self._log_fd)
+            os.close(self._log_fd)
+            self._log_fd = None
+
+    def _fsync_directory(self) -> None:
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,24 @@
+import sys
+from typing import List
+
+
+class StaticText:
+    """
+    Immutable list of interned strings for text that never changes
+    between calls (recommendations, steps).
+    """
+
+    __slots__ = ('items',)
+
+    def __init__(self, *items: str):
+        self.items = tuple(sys.intern(item) for item in items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def to_list(self) -> List[str]:
+        """Fresh list for callers that may append to it"""
+        return list(self.items)
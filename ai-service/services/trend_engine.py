@@ -0,0 +1,163 @@
+import warnings
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# (vital, direction, change threshold, risk points); direction -1 means a fall
+TREND_RULES = (
+    ('heartRate', 1, 10, 20),
+    ('heartRate', -1, 10, 15),
+    ('oxygenSaturation', -1, 3, 30),  # Significant drop in SpO2
+    ('systolicBP', -1, 20, 25)  # Significant BP drop
+)
+
+WINDOW_SIZE = 30
+MEDIAN_WIDTH = 3
+EWMA_ALPHA = 0.3
+# Consecutive out-of-range readings, after a normal one, that count as a sustained crossing
+SUSTAINED_SAMPLES = 3
+SUSTAINED_RISK = 10
+
+
+class TrendEngine:
+    """
+    Trend analysis over the whole historicalVitals window.
+
+    Readings are arranged as (patients, time, vitals) arrays, NaN where
+    missing, newest reading last. Each series is first passed through a
+    3-sample rolling median so a single artifact reading cannot register
+    as a trend. For every vital the engine then computes, in one pass:
+    - slope: least-squares change per reading over the window
+    - drift: slope projected across the window
+    - ewmaDeviation: latest reading minus the EWMA of the earlier ones
+    - sustained: how many of the latest readings are outside the normal range
+    - crossed: whether that run began inside the window (normal, then abnormal)
+    """
+
+    def __init__(self, vital_order: Sequence[str], normal_ranges: Dict[str, Tuple[float, float]]):
+        self.vital_order = tuple(vital_order)
+        self.lower = np.array([normal_ranges[name][0] for name in self.vital_order], dtype=float)
+        self.upper = np.array([normal_ranges[name][1] for name in self.vital_order], dtype=float)
+        self.rules = [
+            (self.vital_order.index(name), direction, threshold, points)
+            for name, direction, threshold, points in TREND_RULES
+        ]
+
+    def to_array(self, current, historical: List) -> np.ndarray:
+        """(time, vitals) array for one patient: the history followed by the current reading"""
+        readings = list(historical[-(WINDOW_SIZE - 1):]) + [current]
+        return np.array([
+            [np.nan if getattr(reading, name, None) is None else getattr(reading, name) for name in self.vital_order]
+            for reading in readings
+        ], dtype=float)
+
+    def stack(self, windows: List[np.ndarray]) -> np.ndarray:
+        """Batch (patients, time, vitals) array, shorter histories NaN-padded at the oldest end"""
+        length = max((window.shape[0] for window in windows), default=1)
+        batch = np.full((len(windows), length, len(self.vital_order)), np.nan)
+        for i, window in enumerate(windows):
+            if window.shape[0]:
+                batch[i, length - window.shape[0]:] = window
+        return batch
+
+    def analyze(self, windows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Per-vital trend features. windows: (time, vitals) for one patient
+        or (patients, time, vitals) for a batch; outputs drop the time axis.
+        """
+        windows = np.asarray(windows, dtype=float)
+        single = windows.ndim == 2
+        if single:
+            windows = windows[None]
+
+        smoothed = self._rolling_median(windows)
+        valid = np.isfinite(smoothed)
+        count = valid.sum(axis=1)
+
+        # Least-squares slope per (patient, vital), ignoring missing readings
+        t = np.arange(windows.shape[1], dtype=float)[None, :, None]
+        safe_count = np.maximum(count, 1)[:, None, :]
+        t_mean = np.where(valid, t, 0).sum(axis=1, keepdims=True) / safe_count
+        x_mean = np.where(valid, smoothed, 0).sum(axis=1, keepdims=True) / safe_count
+        dt = np.where(valid, t - t_mean, 0)
+        dx = np.where(valid, smoothed - x_mean, 0)
+        denominator = (dt * dt).sum(axis=1)
+        slope = np.where(denominator > 0, (dt * dx).sum(axis=1) / np.where(denominator > 0, denominator, 1), 0.0)
+        span = np.where(valid, t, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            elapsed = np.nan_to_num(np.nanmax(span, axis=1) - np.nanmin(span, axis=1))
+
+        latest = smoothed[:, -1]
+        deviation = np.where(np.isfinite(latest), latest - self._ewma(smoothed[:, :-1]), np.nan)
+
+        abnormal = (windows < self.lower) | (windows > self.upper)
+        # Length of the run of out-of-range readings ending at the latest one
+        sustained = np.cumprod(abnormal[:, ::-1], axis=1).sum(axis=1)
+        # The run is a new crossing only if a normal reading precedes it inside the window;
+        # a patient who is abnormal throughout is already scored by the per-vital rules
+        before = np.take_along_axis(
+            windows,
+            np.clip(windows.shape[1] - 1 - sustained, 0, None)[:, None, :],
+            axis=1
+        )[:, 0]
+        crossed = (
+            (sustained < windows.shape[1])
+            & np.isfinite(before)
+            & (before >= self.lower)
+            & (before <= self.upper)
+        )
+
+        features = {
+            "slope": slope,
+            "drift": slope * elapsed,
+            "ewmaDeviation": np.nan_to_num(deviation),
+            "sustained": sustained,
+            "crossed": crossed
+        }
+        if single:
+            features = {name: value[0] for name, value in features.items()}
+        return features
+
+    def trend_risk(self, windows: np.ndarray) -> np.ndarray:
+        """Trend risk (0-100) for one window or per patient in a batch"""
+        features = self.analyze(windows)
+        drift, deviation = features["drift"], features["ewmaDeviation"]
+        # Whichever view of the change is larger: slow drift or recent departure
+        change = np.where(np.abs(deviation) > np.abs(drift), deviation, drift)
+
+        risk = np.zeros(change.shape[:-1])
+        for column, direction, threshold, points in self.rules:
+            risk += np.where(direction * change[..., column] > threshold, points, 0)
+        sustained = (features["sustained"] >= SUSTAINED_SAMPLES) & features["crossed"]
+        risk += SUSTAINED_RISK * sustained.sum(axis=-1)
+
+        return np.minimum(100, risk)
+
+    def _rolling_median(self, windows: np.ndarray) -> np.ndarray:
+        pad = MEDIAN_WIDTH // 2
+        padded = np.pad(windows, ((0, 0), (pad, pad), (0, 0)), constant_values=np.nan)
+        views = np.lib.stride_tricks.sliding_window_view(padded, MEDIAN_WIDTH, axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices stay NaN
+            smoothed = np.nanmedian(views, axis=-1)
+        # A missing reading stays missing; its neighbours must not fill it in
+        smoothed[~np.isfinite(windows)] = np.nan
+        # The latest reading has no successor, so judge it against the two before it
+        tail = windows[:, -MEDIAN_WIDTH:]
+        if tail.shape[1] == MEDIAN_WIDTH:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                smoothed[:, -1] = np.where(np.isfinite(windows[:, -1]), np.nanmedian(tail, axis=1), np.nan)
+        return smoothed
+
+    def _ewma(self, series: np.ndarray) -> np.ndarray:
+        average = np.full(series.shape[::2], np.nan)
+        for step in range(series.shape[1]):
+            reading = series[:, step]
+            average = np.where(
+                np.isnan(reading),
+                average,
+                np.where(np.isnan(average), reading, EWMA_ALPHA * reading + (1 - EWMA_ALPHA) * average)
+            )
+        return average
@@ -0,0 +1,437 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.risk_predictor import VITAL_ORDER
+
+# (bucket seconds, buckets kept) for each rollup resolution, finest first
+ROLLUP_LEVELS = (
+    (60, 1440),  # 1 minute buckets, 24 hours
+    (900, 672)  # 15 minute buckets, 7 days
+)
+DEFAULT_RAW_CAPACITY = 3600  # 4 hours of 4-second readings
+DEFAULT_IDLE_SECONDS = 86400  # Patients with no reading for a day are dropped
+EVICTION_SWEEP_SECONDS = 60
+# Rows allocated for a new ring; doubled as readings arrive, up to its capacity
+INITIAL_ROWS = 16
+
+RAW_COLUMNS = {'time': (0, np.nan), 'values': (len(VITAL_ORDER), np.nan)}
+ROLLUP_COLUMNS = {
+    'start': (0, np.nan),
+    'min': (len(VITAL_ORDER), np.inf),
+    'max': (len(VITAL_ORDER), -np.inf),
+    'sum': (len(VITAL_ORDER), 0.0),
+    'count': (len(VITAL_ORDER), 0.0)
+}
+# Ring name -> columns, as used in saved history files
+RING_LAYOUT = {"raw": RAW_COLUMNS, **{f"{seconds}s": ROLLUP_COLUMNS for seconds, _ in ROLLUP_LEVELS}}
+
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+
+class _Ring:
+    """
+    Fixed-capacity ring of rows across several parallel arrays. Storage
+    starts small and doubles until it reaches capacity, so a patient with
+    a handful of readings costs a handful of rows.
+    """
+
+    def __init__(self, capacity: int, columns: Dict[str, Tuple[int, float]]):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0  # next write position
+        self.columns = columns
+        self.arrays = self._allocate(min(capacity, INITIAL_ROWS))
+
+    def push(self) -> int:
+        """Claim the next row (overwriting the oldest when full) and return its index"""
+        if self.size == self.allocated < self.capacity:
+            self._grow()
+        index = self.head
+        for name, array in self.arrays.items():
+            array[index] = self.columns[name][1]
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return index
+
+    def load(self, data: Dict[str, np.ndarray]) -> None:
+        """Replace the contents with rows given oldest first"""
+        rows = min(len(next(iter(data.values()))), self.capacity)
+        self.arrays = self._allocate(max(rows, min(self.capacity, INITIAL_ROWS)))
+        for name, array in self.arrays.items():
+            array[:rows] = data[name][len(data[name]) - rows:]
+        self.size = rows
+        self.head = rows % self.capacity
+
+    @property
+    def allocated(self) -> int:
+        return len(next(iter(self.arrays.values())))
+
+    def _allocate(self, rows: int) -> Dict[str, np.ndarray]:
+        return {
+            name: np.full((rows, width) if width else rows, fill)
+            for name, (width, fill) in self.columns.items()
+        }
+
+    def _grow(self) -> None:
+        # Not yet wrapped, so rows 0..size-1 are already oldest first
+        grown = self._allocate(min(self.capacity, self.allocated * 2))
+        for name, array in self.arrays.items():
+            grown[name][:self.size] = array[:self.size]
+        self.arrays = grown
+
+    def copy(self) -> "_Ring":
+        """Independent copy of the rows in use, for reading outside the owner's lock"""
+        clone = _Ring.__new__(_Ring)
+        clone.capacity, clone.size, clone.head, clone.columns = self.capacity, self.size, self.head, self.columns
+        clone.arrays = {name: array[:self.size].copy() for name, array in self.arrays.items()}
+        return clone
+
+    @property
+    def last(self) -> Optional[int]:
+        return None if self.size == 0 else (self.head - 1) % self.capacity
+
+    def covers(self, name: str, start: float) -> bool:
+        """Whether nothing at or after `start` has been overwritten yet"""
+        if self.size < self.capacity:
+            return True
+        return bool(np.nanmin(self.arrays[name]) <= start)
+
+    def ordered(self, name: str) -> np.ndarray:
+        """Rows oldest first"""
+        array = self.arrays[name]
+        if self.size < self.capacity:
+            return array[:self.size]
+        return np.concatenate([array[self.head:], array[:self.head]])
+
+
+class _Rollup:
+    """Per-bucket min/max/sum/count of every vital, maintained on append"""
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = seconds
+        self.ring = _Ring(capacity, ROLLUP_COLUMNS)
+
+    def add(self, timestamp: float, values: np.ndarray) -> None:
+        bucket = timestamp - timestamp % self.seconds
+        last = self.ring.last
+        arrays = self.ring.arrays
+        if last is not None and arrays['start'][last] == bucket:
+            index = last
+        elif last is None or bucket > arrays['start'][last]:
+            index = self.ring.push()
+            arrays = self.ring.arrays  # push() may have grown the storage
+            arrays['start'][index] = bucket
+        else:
+            return  # Late reading for a closed bucket; raw history still has it
+
+        present = np.isfinite(values)
+        arrays['min'][index] = np.where(present, np.minimum(arrays['min'][index], values), arrays['min'][index])
+        arrays['max'][index] = np.where(present, np.maximum(arrays['max'][index], values), arrays['max'][index])
+        arrays['sum'][index] += np.where(present, values, 0.0)
+        arrays['count'][index] += present
+
+
+class _PatientHistory:
+    def __init__(self, raw_capacity: int):
+        self.raw = _Ring(raw_capacity, RAW_COLUMNS)
+        self.rollups = [_Rollup(seconds, capacity) for seconds, capacity in ROLLUP_LEVELS]
+        self.last_seen = time.time()
+
+    def rings(self) -> Dict[str, _Ring]:
+        """Every ring by its RING_LAYOUT name"""
+        return {"raw": self.raw, **{f"{rollup.seconds}s": rollup.ring for rollup in self.rollups}}
+
+    def add(self, timestamp: float, values: np.ndarray) -> bool:
+        last = self.raw.last
+        if last is not None and not timestamp > self.raw.arrays['time'][last]:
+            return False  # Already recorded, or older than what is
+        self.last_seen = time.time()
+        index = self.raw.push()
+        self.raw.arrays['time'][index] = timestamp
+        self.raw.arrays['values'][index] = values
+        for rollup in self.rollups:
+            rollup.add(timestamp, values)
+        return True
+
+
+class VitalsHistory:
+    """
+    Per-patient vitals history for trend charts.
+
+    Raw readings are kept in a fixed-size ring per patient. Coarser
+    rollups (min/max/mean per minute and per 15 minutes) are updated
+    incrementally as each reading arrives, so a chart query reads the
+    coarsest resolution that still has enough samples for its point
+    budget and never rescans hours of raw data. Series are then reduced to the budget
+    with LTTB (shape-preserving) or min/max buckets.
+
+    Ring storage grows with the readings actually received, and patients
+    with no reading for idle_seconds are dropped. Each patient's readings
+    must arrive in time order; one not newer than the last stored is
+    ignored. History is kept in the process that recorded it; save() and
+    load() carry it across restarts.
+    """
+
+    def __init__(self, raw_capacity: int = DEFAULT_RAW_CAPACITY, idle_seconds: float = DEFAULT_IDLE_SECONDS):
+        self.raw_capacity = raw_capacity
+        self.idle_seconds = idle_seconds
+        self._patients: Dict[str, _PatientHistory] = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.time()
+        # Mutation counter, and its value when history was last saved
+        self._changes = 0
+        self._saved_changes = 0
+
+    def append(self, patient_id: str, vitals: Dict[str, Optional[float]], timestamp: Optional[float] = None) -> bool:
+        """
+        Record one reading; NaN/None vitals are stored as missing. Returns
+        False when the reading is not newer than the patient's last one.
+        """
+        if timestamp is None or timestamp != timestamp:
+            timestamp = time.time()
+        values = np.array([
+            np.nan if vitals.get(name) is None else vitals[name] for name in VITAL_ORDER
+        ], dtype=float)
+        with self._lock:
+            history = self._patients.get(patient_id)
+            if history is None:
+                history = self._patients[patient_id] = _PatientHistory(self.raw_capacity)
+            if not history.add(timestamp, values):
+                return False
+            self._changes += 1
+            if history.last_seen - self._swept_at > EVICTION_SWEEP_SECONDS:
+                self._evict_idle(history.last_seen)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._patients.clear()
+            self._changes += 1
+
+    @property
+    def dirty(self) -> bool:
+        """Whether anything changed since the last save() or load()"""
+        return self._changes != self._saved_changes
+
+    def save(self, path: str) -> int:
+        """
+        Write every patient's rings, oldest row first, to one .npz file
+        (replaced atomically). Skipped when nothing changed since the last
+        save. Returns the number of patients saved.
+        """
+        # Only the ring copies are taken under the lock; packing and the write happen outside it
+        with self._lock:
+            if not self.dirty:
+                return 0
+            changes = self._changes
+            patients = [
+                (patient_id, history.last_seen, {name: ring.copy() for name, ring in history.rings().items()})
+                for patient_id, history in self._patients.items()
+            ]
+
+        arrays = {"patients": np.array([patient_id for patient_id, _, _ in patients], dtype=str)}
+        arrays["lastSeen"] = np.array([last_seen for _, last_seen, _ in patients])
+        for ring_name, columns in RING_LAYOUT.items():
+            rings = [copies[ring_name] for _, _, copies in patients]
+            arrays[f"{ring_name}/sizes"] = np.array([r.size for r in rings], dtype=np.int64)
+            for column, (width, _) in columns.items():
+                parts = [r.ordered(column) for r in rings]
+                empty = np.empty((0, width) if width else 0)
+                arrays[f"{ring_name}/{column}"] = np.concatenate(parts) if parts else empty
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._saved_changes = max(self._saved_changes, changes)
+        return len(patients)
+
+    def load(self, path: str) -> int:
+        """Restore history written by save(); returns the number of patients loaded"""
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as saved:
+            data = {name: saved[name] for name in saved.files}
+
+        with self._lock:
+            offsets = {}
+            for index, patient_id in enumerate(data["patients"]):
+                history = _PatientHistory(self.raw_capacity)
+                history.last_seen = float(data["lastSeen"][index])
+                for ring_name, ring in history.rings().items():
+                    sizes = data[f"{ring_name}/sizes"]
+                    begin = offsets.get(ring_name, 0)
+                    offsets[ring_name] = begin + int(sizes[index])
+                    ring.load({
+                        column: data[f"{ring_name}/{column}"][begin:offsets[ring_name]]
+                        for column in ring.columns
+                    })
+                self._patients[str(patient_id)] = history
+            # Matches the file unless it was merged into existing history
+            self._changes += 1
+            if len(self._patients) == len(data["patients"]):
+                self._saved_changes = self._changes
+        return len(data["patients"])
+
+    def _evict_idle(self, now: float) -> None:
+        self._swept_at = now
+        idle = [
+            patient_id for patient_id, history in self._patients.items()
+            if now - history.last_seen > self.idle_seconds
+        ]
+        for patient_id in idle:
+            del self._patients[patient_id]
+        if idle:
+            self._changes += 1
+
+    def __len__(self) -> int:
+        return len(self._patients)
+
+    def __contains__(self, patient_id: str) -> bool:
+        return patient_id in self._patients
+
+    def query(
+        self,
+        patient_id: str,
+        vital: str,
+        points: int = 500,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        method: str = "lttb"
+    ) -> Optional[Dict]:
+        """
+        Downsampled series of one vital between start and end (epoch
+        seconds). Returns None for an unknown patient.
+        """
+        history = self._patients.get(patient_id)
+        if history is None:
+            return None
+        column = VITAL_ORDER.index(vital)
+        points = max(MIN_POINTS, min(MAX_POINTS, points))
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+
+        with self._lock:
+            resolution, series = self._source(history, column, points, start, end)
+
+        if method == "minmax":
+            timestamps, low, high = _minmax(*series, points)
+            return {
+                "patientId": patient_id,
+                "vital": vital,
+                "method": method,
+                "resolution": resolution,
+                "timestamps": _epoch_millis(timestamps),
+                "min": _values(low),
+                "max": _values(high)
+            }
+
+        timestamps, _, _, mean = series
+        timestamps, mean = _lttb(timestamps, mean, points)
+        return {
+            "patientId": patient_id,
+            "vital": vital,
+            "method": "lttb",
+            "resolution": resolution,
+            "timestamps": _epoch_millis(timestamps),
+            "values": _values(mean)
+        }
+
+    def _source(self, history: _PatientHistory, column: int, points: int, start: float, end: float):
+        """
+        Coarsest rollup that still has at least `points` samples in range.
+        Failing that, the finest source that still reaches back to `start`
+        (raw only while it does), so a short ring never silently truncates
+        the range. Returns (label, (t, min, max, mean)).
+        """
+        for rollup in reversed(history.rollups):
+            series = _rollup_series(rollup, column, start, end)
+            if series[0].size >= points:
+                return f"{rollup.seconds}s", series
+
+        if history.raw.covers('time', start):
+            return "raw", _raw_series(history.raw, column, start, end)
+
+        for rollup in history.rollups:
+            if rollup.ring.covers('start', start) or rollup is history.rollups[-1]:
+                return f"{rollup.seconds}s", _rollup_series(rollup, column, start, end)
+
+
+def _rollup_series(rollup: _Rollup, column: int, start: float, end: float):
+    starts = rollup.ring.ordered('start')
+    in_range = (starts + rollup.seconds > start) & (starts <= end)
+    counts = rollup.ring.ordered('count')[in_range, column]
+    populated = counts > 0
+    sums = rollup.ring.ordered('sum')[in_range, column][populated]
+    return (
+        starts[in_range][populated] + rollup.seconds / 2,
+        rollup.ring.ordered('min')[in_range, column][populated],
+        rollup.ring.ordered('max')[in_range, column][populated],
+        sums / counts[populated]
+    )
+
+
+def _raw_series(raw: _Ring, column: int, start: float, end: float):
+    times = raw.ordered('time')
+    values = raw.ordered('values')[:, column]
+    keep = (times >= start) & (times <= end) & np.isfinite(values)
+    times, values = times[keep], values[keep]
+    order = np.argsort(times, kind='stable')
+    times, values = times[order], values[order]
+    return times, values, values, values
+
+
+def _lttb(t: np.ndarray, v: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets; bucket averages are computed in one vectorized step"""
+    n = t.size
+    if n <= points:
+        return t, v
+
+    # Interior points split into points-2 buckets; first and last points are always kept
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    bucket_sizes = np.diff(np.append(edges, n))
+    avg_t = np.add.reduceat(t, edges) / bucket_sizes
+    avg_v = np.add.reduceat(v, edges) / bucket_sizes
+    # The bucket after the last interior one is the final point itself
+    avg_t[-1], avg_v[-1] = t[-1], v[-1]
+
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (t[previous] - avg_t[i + 1]) * (v[lo:hi] - v[previous])
+            - (t[previous] - t[lo:hi]) * (avg_v[i + 1] - v[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+
+    return t[selected], v[selected]
+
+
+def _minmax(t: np.ndarray, low: np.ndarray, high: np.ndarray, _mean: np.ndarray, points: int):
+    """Equal-count buckets keeping each bucket's extremes"""
+    n = t.size
+    if n <= points:
+        return t, low, high
+    edges = np.linspace(0, n, points + 1).astype(int)[:-1]
+    return t[edges], np.minimum.reduceat(low, edges), np.maximum.reduceat(high, edges)
+
+
+def _epoch_millis(timestamps: np.ndarray) -> List[int]:
+    # Epoch milliseconds keep the payload small and chart-library friendly
+    return (timestamps * 1000).astype(np.int64).tolist()
+
+
+def _values(values: np.ndarray) -> List[float]:
+    return np.round(values, 2).tolist()
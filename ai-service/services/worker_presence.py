@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process assumes it is alone
+    fcntl = None
+
+
+class WorkerPresence:
+    """
+    Tells a worker whether any sibling worker is running under the same
+    name, for state that is only correct when one process holds it all.
+
+    One worker holds an exclusive "leader" lock for its lifetime; every
+    other worker holds a shared "member" lock. The leader is alone exactly
+    when it can take the member lock exclusively. A member takes over
+    leadership when the leader exits. Locks are released by the OS when a
+    process dies, so no stale registrations are left behind.
+    """
+
+    def __init__(self, name: str, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self._is_leader = False
+        self._alone = True
+        self._checked_at = -float("inf")
+        if fcntl is None:
+            return
+        directory = tempfile.gettempdir()
+        self._leader_file = open(os.path.join(directory, f"{name}.leader.lock"), 'a')
+        self._member_file = open(os.path.join(directory, f"{name}.member.lock"), 'a')
+        self.alone()
+
+    def alone(self) -> bool:
+        """Whether this is the only worker; re-checked at most every check_interval"""
+        if fcntl is None:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._alone
+        self._checked_at = now
+
+        if not self._is_leader:
+            try:
+                fcntl.flock(self._leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                fcntl.flock(self._member_file, fcntl.LOCK_SH)
+                self._alone = False
+                return False
+            self._is_leader = True
+            fcntl.flock(self._member_file, fcntl.LOCK_UN)
+
+        try:
+            fcntl.flock(self._member_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._alone = False
+        else:
+            fcntl.flock(self._member_file, fcntl.LOCK_UN)
+            self._alone = True
+        return self._alone
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.alert_sink import AlertSink
+
+
+class StandInBackend:
+    """Local HTTP server recording every alert batch; fails the first `failures` requests with a 500"""
+
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                backend.batches.append(body["alerts"])
+                status = 200
+                if backend.failures:
+                    backend.failures -= 1
+                    status = 500
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/alerts"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def alert(alert_id: str, severity: str = "medium") -> dict:
+    return {"alertId": alert_id, "patientId": "P1", "severity": severity}
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            pytest.fail("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_critical_alerts_bypass_batching():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=60)
+        await sink.start()
+        assert sink.offer(alert("routine"))
+        assert sink.offer(alert("urgent", severity="critical"))
+
+        await wait_for(lambda: backend.batches)
+        # Sent alone, long before the routine alert's flush interval is up
+        assert backend.batches == [[alert("urgent", severity="critical")]]
+        assert sink.status()["pending"] == 1
+        assert sink.status()["criticalSent"] == 1
+        await sink.stop()
+
+    with StandInBackend() as backend:
+        asyncio.run(scenario(backend))
+        assert backend.batches[-1] == [alert("routine")]
+
+
+def test_failed_batches_are_retried_after_a_backoff():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=60, retry_base_delay=0.1)
+        await sink.start()
+        sink.offer(alert("a1"))
+        sink.offer(alert("a2"))
+
+        await sink.flush()
+        assert sink.status()["failed"] == 2
+        assert sink.status()["retryBatches"] == 1
+
+        await sink.flush()  # not due yet
+        assert sink.status()["retried"] == 0
+        assert len(backend.batches) == 1
+
+        await asyncio.sleep(0.12)
+        await sink.flush()
+        assert sink.status()["sent"] == 2
+        assert sink.status()["retried"] == 1
+        assert sink.status()["retryBatches"] == 0
+        await sink.stop()
+
+    with StandInBackend(failures=1) as backend:
+        asyncio.run(scenario(backend))
+        assert backend.batches == [[alert("a1"), alert("a2")]] * 2
+
+
+def test_retries_back_off_until_the_deadline():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=0.01, retry_base_delay=0.02, retry_deadline=0.5)
+        await sink.start()
+        sink.offer(alert("a1"))
+
+        await wait_for(lambda: sink.status()["dropped"] == 1)
+        assert sink.status()["retryBatches"] == 0
+        await sink.stop()
+        return sink.status()
+
+    with StandInBackend(failures=1000) as backend:
+        status = asyncio.run(scenario(backend))
+        # First try, then retries 0.02, 0.04, 0.08 and 0.16 s apart; the next would pass the deadline
+        assert len(backend.batches) == 5
+        assert status["retried"] == 4
+
+
+def test_critical_alerts_outlive_the_retry_deadline():
+    async def scenario(backend):
+        sink = AlertSink(
+            backend.url,
+            flush_interval=60,
+            retry_base_delay=0.01,
+            max_retry_delay=0.02,
+            retry_deadline=0.01
+        )
+        await sink.start()
+        sink.offer(alert("urgent", severity="critical"))
+
+        await wait_for(lambda: sink.status()["criticalSent"] == 1)
+        assert sink.status()["dropped"] == 0
+        assert sink.status()["retried"] == 5
+        await sink.stop()
+
+    with StandInBackend(failures=5) as backend:
+        asyncio.run(scenario(backend))
+
+
+def test_full_retry_queue_gives_up_non_critical_batches_first():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=60, max_batch=1, max_retry_batches=2, retry_base_delay=60)
+        await sink.start()
+        sink.offer(alert("a1"))
+        await sink.flush()
+        await sink.flush()  # fills the retry queue with a critical and a routine batch
+        sink.offer(alert("c1", severity="critical"))
+        await wait_for(lambda: sink.status()["retryBatches"] == 2)
+
+        sink.offer(alert("c2", severity="critical"))
+        await wait_for(lambda: sink.status()["dropped"] == 1)  # a1 made way
+        sink.offer(alert("a2"))
+        await sink.flush()
+        assert sink.status()["dropped"] == 2  # a2 does not displace a critical batch
+        assert sink.status()["retryBatches"] == 2
+        await sink.stop()
+
+    with StandInBackend(failures=1000) as backend:
+        asyncio.run(scenario(backend))
+
+
+def test_alerts_are_dropped_when_queue_is_full():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=60, max_pending=2)
+        await sink.start()
+        assert sink.offer(alert("a1"))
+        assert sink.offer(alert("a2"))
+        assert not sink.offer(alert("a3"))
+        assert sink.status()["dropped"] == 1
+        assert sink.status()["pending"] == 2
+        await sink.stop()
+
+    with StandInBackend() as backend:
+        asyncio.run(scenario(backend))
+        assert backend.batches == [[alert("a1"), alert("a2")]]
+
+
+def test_stop_delivers_everything_queued():
+    async def scenario(backend):
+        sink = AlertSink(backend.url, flush_interval=0.01, max_batch=1)
+        await sink.start()
+        for i in range(20):
+            sink.offer(alert(f"a{i}"))
+        await asyncio.sleep(0.02)  # stop while the flusher is mid-batch
+        await sink.stop()
+        assert sink.status()["sent"] == 20
+
+    with StandInBackend() as backend:
+        asyncio.run(scenario(backend))
+        assert [batch[0]["alertId"] for batch in backend.batches] == [f"a{i}" for i in range(20)]
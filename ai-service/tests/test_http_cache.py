@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+from services import http_cache
+from services.http_cache import CachedBody, ResponseCache, _accepted_encodings
+
+CONTENT = {"heatmap": [{"patientId": f"P{i}", "riskScore": 12.5, "riskLevel": "low"} for i in range(50)]}
+
+
+def request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", {}),
+    ("gzip", {"gzip": 1.0}),
+    ("gzip, deflate, br", {"gzip": 1.0, "deflate": 1.0, "br": 1.0}),
+    ("GZIP;q=0.5, identity", {"gzip": 0.5, "identity": 1.0}),
+    ("gzip;q=0, deflate", {"deflate": 1.0}),
+    ("gzip ; q = 0.8", {"gzip": 0.8}),
+    ("gzip;q=oops", {}),
+    ("x-gzip-like, gzipx", {"x-gzip-like": 1.0, "gzipx": 1.0}),
+    ("*;q=0.3, gzip;q=0.9", {**{coding: 0.3 for coding in http_cache.COMPRESSORS}, "gzip": 0.9}),
+    ("*;q=0", {})
+])
+def test_accept_encoding_parsing(header, expected):
+    assert _accepted_encodings(header) == expected
+
+
+def test_identity_body_and_304_on_its_etag():
+    body = CachedBody(CONTENT)
+    response = body.respond(request())
+    assert response.status_code == 200
+    assert json.loads(response.body) == CONTENT
+    assert "content-encoding" not in response.headers
+    etag = response.headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        not_modified = body.respond(request(if_none_match=if_none_match))
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+        assert not_modified.body == b""
+    assert body.respond(request(if_none_match='"other"')).status_code == 200
+
+
+def test_304_carries_the_etag_of_the_selected_encoding():
+    body = CachedBody(CONTENT)
+    response = body.respond(request(accept_encoding="gzip;q=1, zstd;q=0.5"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == body.body
+    gzip_etag = response.headers["etag"]
+    assert gzip_etag != body.etag
+
+    not_modified = body.respond(request(accept_encoding="gzip", if_none_match=gzip_etag))
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == gzip_etag
+
+    # The client's cached gzip copy is not what it would be sent now
+    identity = body.respond(request(if_none_match=gzip_etag))
+    assert identity.status_code == 200
+    assert identity.headers["etag"] == body.etag
+    assert body.respond(request(accept_encoding="gzip", if_none_match=body.etag)).status_code == 200
+
+
+def test_variants_are_compressed_only_when_requested():
+    body = CachedBody(CONTENT)
+    body.respond(request())
+    body.respond(request(accept_encoding="gzip", if_none_match=body.etag_for("gzip")))
+    assert body._variants == {}
+
+    first = body.respond(request(accept_encoding="gzip")).body
+    assert list(body._variants) == ["gzip"]
+    assert body.respond(request(accept_encoding="gzip")).body is first
+
+
+@pytest.mark.skipif(http_cache.zstandard is None, reason="zstandard is not installed")
+def test_zstd_is_preferred_on_equal_quality():
+    body = CachedBody(CONTENT)
+    response = body.respond(request(accept_encoding="gzip, zstd"))
+    assert response.headers["content-encoding"] == "zstd"
+    assert response.headers["etag"] == body.etag_for("zstd")
+    assert http_cache.zstandard.ZstdDecompressor().decompress(response.body) == body.body
+
+
+def test_cache_keeps_the_body_when_a_new_version_has_the_same_content():
+    cache = ResponseCache(max_entries=2)
+    rows = {"ICU": [{"patientId": "P1"}], "ER": [{"patientId": "P2"}]}
+
+    icu = cache.get("ICU", 1, lambda: {"heatmap": rows["ICU"]})
+    icu.variant("gzip")
+    # Another ward changed: the version moved on but this ward's body did not
+    rows["ER"].append({"patientId": "P3"})
+    assert cache.get("ICU", 2, lambda: {"heatmap": rows["ICU"]}) is icu
+    assert list(icu._variants) == ["gzip"]
+
+    rows["ICU"] = [{"patientId": "P1", "riskLevel": "high"}]
+    changed = cache.get("ICU", 3, lambda: {"heatmap": rows["ICU"]})
+    assert changed is not icu
+    assert changed.etag != icu.etag
+
+    cache.get("ER", 3, lambda: {"heatmap": rows["ER"]})
+    cache.get("ward", 3, lambda: {"heatmap": []})
+    assert cache.get("ICU", 3, lambda: {"heatmap": []}) is not changed  # evicted, rebuilt
@@ -0,0 +1,139 @@
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from services import shared_roster
+from services.shared_roster import SharedRoster
+
+
+@pytest.fixture
+def roster():
+    created = []
+
+    def make(capacity: int = 8) -> SharedRoster:
+        instance = SharedRoster(name=f"test_roster_{uuid.uuid4().hex[:12]}", capacity=capacity)
+        created.append(instance)
+        return instance
+
+    yield make
+    for instance in created:
+        instance.unlink()
+        instance.close()
+
+
+def publish(roster: SharedRoster, patient_id: str, heart_rate: float, level: str = "low", ward_id=None) -> None:
+    roster.update(patient_id, {"heartRate": heart_rate}, risk_score=10.0, risk_level=level, ward_id=ward_id)
+
+
+def test_lookup_returns_each_patients_own_row(roster):
+    r = roster()
+    publish(r, "P1", 60, ward_id="ICU")
+    publish(r, "P2", 120, level="high", ward_id="ER")
+    publish(r, "P1", 65)
+
+    assert r.get("P1")["vitals"]["heartRate"] == 65
+    assert r.get("P1")["wardId"] == "ICU"
+    assert r.get("P2")["riskLevel"] == "high"
+    assert r.get("P3") is None
+    assert [row["patientId"] for row in r.snapshot(ward_id="ER")] == ["P2"]
+    assert len(r) == 2
+
+
+def test_sibling_worker_sees_published_rows(roster):
+    r = roster()
+    sibling = SharedRoster(name=r.name)
+    try:
+        publish(r, "P1", 70)
+        assert sibling.get("P1")["vitals"]["heartRate"] == 70
+        assert sibling.capacity == r.capacity
+    finally:
+        sibling.close()
+
+
+def test_full_roster_reclaims_least_recently_updated_row(roster):
+    r = roster(capacity=2)
+    publish(r, "old", 50)
+    publish(r, "recent", 60)
+    publish(r, "old", 55)  # "recent" is now the stalest
+    publish(r, "new", 70)
+
+    assert r.get("recent") is None
+    assert r.get("old")["vitals"]["heartRate"] == 55
+    assert r.get("new")["vitals"]["heartRate"] == 70
+    assert len(r) == 2
+
+
+def test_get_does_not_return_a_reclaimed_row(roster):
+    r = roster(capacity=1)
+    sibling = SharedRoster(name=r.name)
+    try:
+        publish(r, "first", 50)
+        assert sibling.get("first") is not None  # caches the slot
+        publish(r, "second", 150, level="critical")
+        assert sibling.get("first") is None
+        assert sibling.get("second")["riskLevel"] == "critical"
+    finally:
+        sibling.close()
+
+
+def test_ids_that_do_not_fit_are_rejected_not_truncated(roster):
+    r = roster()
+    prefix = "x" * shared_roster.PATIENT_ID_BYTES
+    publish(r, prefix, 80)
+    with pytest.raises(ValueError):
+        publish(r, prefix + "1", 150, level="critical")
+    with pytest.raises(ValueError):
+        publish(r, "a" + "é" * 40, 80)  # 81 bytes, would be cut mid-character
+    with pytest.raises(ValueError):
+        publish(r, "P1", 80, ward_id="w" * (shared_roster.WARD_ID_BYTES + 1))
+
+    assert r.get(prefix + "1") is None
+    assert r.get(prefix)["vitals"]["heartRate"] == 80
+    assert r.snapshot(ward_id="w" * (shared_roster.WARD_ID_BYTES + 1)) == []
+    # Multi-byte IDs that fit round-trip intact
+    publish(r, "é" * 32, 90)
+    assert r.get("é" * 32)["patientId"] == "é" * 32
+    assert len(r.snapshot()) == 2
+
+
+def test_row_left_odd_by_a_dead_writer_is_repaired(roster, monkeypatch):
+    monkeypatch.setattr(shared_roster, "MAX_READ_RETRIES", 5)
+    r = roster()
+    publish(r, "a", 80)
+    slot = r._find_slot("a", create=False)
+    r._rows['seq'][slot] |= 1  # writer killed between the two seq updates
+
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(rows=r.read_rows(), row=r.get("a")))
+    reader.start()
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+    assert result["row"]["vitals"]["heartRate"] == 80
+    assert r._rows['seq'][slot] % 2 == 0
+
+    # Later writes keep the counter even once they finish
+    publish(r, "a", 85)
+    assert r._rows['seq'][slot] % 2 == 0
+    assert r.get("a")["vitals"]["heartRate"] == 85
+    assert np.all(result["rows"]['seq'] % 2 == 0)
+
+
+def test_only_newer_keeps_the_stored_reading_unless_superseded(roster):
+    r = roster()
+    r.update("P1", {"heartRate": 80}, 10.0, "low", vitals_timestamp="2026-01-01T10:00:00")
+    updated_at = r.get("P1")["updatedAt"]
+
+    # The same reading polled again, an older one and one without a timestamp are all ignored
+    assert not r.update("P1", {"heartRate": 80}, 10.0, "low", vitals_timestamp="2026-01-01T10:00:00", only_newer=True)
+    assert not r.update("P1", {"heartRate": 70}, 10.0, "low", vitals_timestamp="2026-01-01T09:00:00", only_newer=True)
+    assert not r.update("P1", {"heartRate": 60}, 10.0, "low", only_newer=True)
+    assert r.get("P1")["vitals"]["heartRate"] == 80
+    assert r.get("P1")["updatedAt"] == updated_at
+
+    assert r.update("P1", {"heartRate": 90}, 10.0, "low", vitals_timestamp="2026-01-01T10:05:00", only_newer=True)
+    assert r.get("P1")["vitals"]["heartRate"] == 90
+    # A patient not in the roster yet is always added
+    assert r.update("P2", {"heartRate": 75}, 10.0, "low", only_newer=True)
+    assert r.get("P2")["vitals"]["heartRate"] == 75
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from services.risk_predictor import VITAL_ORDER, VitalSigns
+from services.signal_quality import IMPLAUSIBLE, MISSING, OK, SPIKE, SignalQualityFilter
+
+STABLE = dict(heartRate=80, systolicBP=120, diastolicBP=80, oxygenSaturation=98, respiratoryRate=16, temperature=98.6)
+HR, SPO2, TEMP = (VITAL_ORDER.index(name) for name in ('heartRate', 'oxygenSaturation', 'temperature'))
+
+
+@pytest.fixture(scope="module")
+def quality():
+    return SignalQualityFilter()
+
+
+def vitals(**overrides) -> VitalSigns:
+    return VitalSigns(**{**STABLE, **overrides})
+
+
+def row(**overrides) -> list:
+    return [np.nan if value is None else value for value in vitals(**overrides).model_dump().values()]
+
+
+def test_assess_flags_and_drops_missing_and_implausible(quality):
+    usable, flags = quality.assess(vitals(temperature=None, oxygenSaturation=40))
+
+    assert flags == {'temperature': 'missing', 'oxygenSaturation': 'implausible'}
+    assert usable['temperature'] is None
+    assert usable['oxygenSaturation'] is None
+    assert usable['heartRate'] == 80
+
+
+def test_assess_keeps_a_spike_but_flags_it(quality):
+    history = [vitals()] * 5
+    usable, flags = quality.assess(vitals(heartRate=150), history)
+    assert flags == {'heartRate': 'spike'}
+    assert usable['heartRate'] == 150
+
+    # Confirmed by the previous reading, the same value is a real change
+    usable, flags = quality.assess(vitals(heartRate=150), history + [vitals(heartRate=148)])
+    assert flags == {}
+
+
+@pytest.mark.parametrize("heart_rate", [0, 12, 19])
+def test_very_low_heart_rate_is_scored_not_rejected(quality, heart_rate):
+    usable, flags = quality.assess(vitals(heartRate=heart_rate))
+    assert flags == {}
+    assert usable['heartRate'] == heart_rate
+
+    # A sudden drop to asystole is a spike, which is still scored
+    usable, flags = quality.assess(vitals(heartRate=heart_rate), [vitals()] * 5)
+    assert flags == {'heartRate': 'spike'}
+    assert usable['heartRate'] == heart_rate
+
+
+def test_assess_batch_codes_each_patient(quality):
+    values = np.array([
+        row(),
+        row(temperature=None),
+        row(oxygenSaturation=40),
+        row(heartRate=150),
+        row(heartRate=0)
+    ])
+    recent = np.repeat(np.array(row(), dtype=float)[None, None], len(values), axis=0).repeat(5, axis=1)
+
+    usable, codes = quality.assess_batch(values, recent)
+    assert codes[0].tolist() == [OK] * len(VITAL_ORDER)
+    assert codes[1, TEMP] == MISSING and not usable[1, TEMP]
+    assert codes[2, SPO2] == IMPLAUSIBLE and not usable[2, SPO2]
+    assert codes[3, HR] == SPIKE and usable[3, HR]
+    assert codes[4, HR] == SPIKE and usable[4, HR]
+    assert np.count_nonzero(codes) == 4
+
+
+def test_assess_batch_without_history_has_no_spikes(quality):
+    usable, codes = quality.assess_batch(np.array([row(heartRate=150), row(heartRate=400)]))
+    assert codes[0, HR] == OK
+    assert codes[1, HR] == IMPLAUSIBLE
+    assert usable.sum() == 2 * len(VITAL_ORDER) - 1
+
+
+def test_assess_many_matches_assess(quality):
+    patients = [
+        (vitals(heartRate=150), [vitals()] * 3),
+        (vitals(oxygenSaturation=None), []),
+        (vitals(heartRate=0, temperature=120), [vitals()] * 7)
+    ]
+    assert quality.assess_many([p[0] for p in patients], [p[1] for p in patients]) == [
+        quality.assess(current, history) for current, history in patients
+    ]
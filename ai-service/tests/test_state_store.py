@@ -0,0 +1,65 @@
+import uuid
+
+import pytest
+
+from services.shared_roster import SharedRoster
+from services.state_store import StateStore
+
+
+@pytest.fixture
+def roster():
+    instance = SharedRoster(name=f"test_store_{uuid.uuid4().hex[:12]}", capacity=16)
+    yield instance
+    instance.unlink()
+    instance.close()
+
+
+def publish(roster, patient_id, heart_rate):
+    roster.update(patient_id, {"heartRate": heart_rate}, risk_score=10.0, risk_level="low")
+
+
+def restored(directory):
+    fresh = SharedRoster(name=f"test_store_{uuid.uuid4().hex[:12]}", capacity=16)
+    try:
+        StateStore(directory).attach(fresh)
+        return {row["patientId"]: row["vitals"]["heartRate"] for row in fresh.snapshot()}
+    finally:
+        fresh.unlink()
+        fresh.close()
+
+
+def test_snapshot_and_log_restore_latest_state(roster, tmp_path):
+    store = StateStore(str(tmp_path))
+    store.attach(roster)
+    publish(roster, "P1", 60)
+    publish(roster, "P2", 70)
+    assert store.snapshot(roster)
+    assert not store.snapshot(roster)  # nothing new
+    assert store.load_log().size == 0
+
+    publish(roster, "P1", 65)
+    assert store.load_log().size == 1
+    store.close()
+
+    assert restored(str(tmp_path)) == {"P1": 65, "P2": 70}
+
+
+def test_records_written_during_a_snapshot_stay_in_the_log(roster, tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path))
+    store.attach(roster)
+    publish(roster, "P1", 60)
+
+    read_rows = roster.read_rows
+
+    def write_while_snapshotting():
+        rows = read_rows()
+        publish(roster, "P2", 90)  # lands after the snapshot's copy
+        return rows
+
+    monkeypatch.setattr(roster, "read_rows", write_while_snapshotting)
+    assert store.snapshot(roster)
+    monkeypatch.undo()
+
+    assert [row["patientId"].decode() for row in store.load_log()] == ["P2"]
+    store.close()
+    assert restored(str(tmp_path)) == {"P1": 60, "P2": 90}
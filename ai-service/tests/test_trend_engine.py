@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from services.risk_predictor import RiskPredictor, VitalSigns
+
+STABLE = dict(heartRate=80, systolicBP=120, diastolicBP=80, oxygenSaturation=98, respiratoryRate=16, temperature=98.6)
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    return RiskPredictor()
+
+
+def readings(count: int, **overrides) -> list:
+    """`count` stable readings; an override is a constant or a function of the reading index"""
+    return [
+        VitalSigns(**{
+            name: value(i) if callable(value) else value
+            for name, value in {**STABLE, **overrides}.items()
+        })
+        for i in range(count)
+    ]
+
+
+def random_patient(rng) -> tuple:
+    values = rng.normal([85, 120, 80, 96, 17, 98.8], [15, 20, 10, 3, 4, 1.2], size=(rng.integers(0, 31), 6))
+    values[rng.random(values.shape) < 0.15] = np.nan
+    series = [
+        VitalSigns(**{name: None if np.isnan(v) else float(v) for name, v in zip(STABLE, row)})
+        for row in values
+    ]
+    if not series:
+        return VitalSigns(**STABLE), []
+    return series[-1], series[:-1]
+
+
+def test_batch_matches_single_patient_scoring(predictor):
+    rng = np.random.default_rng(7)
+    patients = [random_patient(rng) for _ in range(300)]
+    vitals_list = [current for current, _ in patients]
+    historical_list = [historical for _, historical in patients]
+
+    batch = predictor.batch_trend_risk(vitals_list, historical_list)
+    single = [predictor.trend_risk(current, historical) for current, historical in patients]
+    assert batch.tolist() == pytest.approx(single)
+    assert np.count_nonzero(batch) > 0
+
+
+def test_padding_of_a_short_history_is_not_smoothed_into_a_reading(predictor):
+    # Batched next to a full window, this history is NaN-padded at the oldest end;
+    # the padding slot must stay empty rather than take the first reading's value
+    historical = readings(4, oxygenSaturation=lambda i: 99 - i)
+    current = VitalSigns(**{**STABLE, 'oxygenSaturation': 95})
+
+    batch = predictor.batch_trend_risk([current, VitalSigns(**STABLE)], [historical, readings(29)])
+    assert batch[0] == predictor.trend_risk(current, historical)
+
+
+def test_single_artifact_reading_is_not_a_trend(predictor):
+    historical = readings(20, heartRate=lambda i: 180 if i == 10 else 80)
+    assert predictor.trend_risk(VitalSigns(**STABLE), historical) == 0
+
+    spike_now = VitalSigns(**{**STABLE, 'heartRate': 190})
+    assert predictor.trend_risk(spike_now, readings(20)) == 0
+    assert predictor.batch_trend_risk([spike_now], [readings(20)])[0] == 0
+
+
+def test_slow_drift_across_the_window_is_detected(predictor):
+    # Half a beat per reading: never a large step, but 14.5 bpm over the window
+    historical = readings(29, heartRate=lambda i: 70 + 0.5 * i)
+    current = VitalSigns(**{**STABLE, 'heartRate': 84.5})
+    assert predictor.trend_risk(current, historical) == 20
+    assert predictor.batch_trend_risk([current], [historical])[0] == 20
+
+    # The same rise over only a few readings is too small to count
+    assert predictor.trend_risk(VitalSigns(**{**STABLE, 'heartRate': 72}), readings(4, heartRate=lambda i: 70 + 0.5 * i)) == 0
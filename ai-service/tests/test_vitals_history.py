@@ -0,0 +1,109 @@
+import numpy as np
+
+from services.vitals_history import VitalsHistory, _lttb
+
+T0 = 1_710_000_000.0  # on a 15 minute boundary
+
+
+def fill(history: VitalsHistory, patient_id: str = "P1", readings: int = 120, step: float = 4.0) -> None:
+    """`readings` readings `step` seconds apart, heart rate equal to the reading's index"""
+    for i in range(readings):
+        history.append(patient_id, {"heartRate": float(i), "oxygenSaturation": 98.0}, T0 + i * step)
+
+
+def test_minute_rollups_keep_each_buckets_extremes():
+    history = VitalsHistory()
+    fill(history)  # 8 minutes, 15 readings a minute
+
+    series = history.query("P1", "heartRate", points=8, method="minmax")
+    assert series["resolution"] == "60s"
+    assert series["min"] == [15.0 * m for m in range(8)]
+    assert series["max"] == [15.0 * m + 14 for m in range(8)]
+    assert series["timestamps"] == [int((T0 + 60 * m + 30) * 1000) for m in range(8)]
+
+    lttb = history.query("P1", "heartRate", points=8)
+    assert lttb["values"] == [15.0 * m + 7 for m in range(8)]
+
+
+def test_source_is_the_coarsest_resolution_that_fills_the_budget():
+    history = VitalsHistory()
+    fill(history)
+    assert history.query("P1", "heartRate", points=5)["resolution"] == "60s"
+    # Too few minute buckets for 50 points: raw readings, reduced to the budget
+    series = history.query("P1", "heartRate", points=50)
+    assert series["resolution"] == "raw"
+    assert len(series["values"]) == 50
+
+    # A raw ring that has wrapped no longer reaches back to the start of the range
+    short = VitalsHistory(raw_capacity=20)
+    fill(short)
+    series = short.query("P1", "heartRate", points=50)
+    assert series["resolution"] == "60s"
+    assert series["timestamps"][0] == int((T0 + 30) * 1000)
+    assert short.query("P1", "heartRate", points=50, start=T0 + 400)["resolution"] == "raw"
+
+
+def test_lttb_keeps_the_endpoints_and_the_peaks():
+    t = np.arange(1000, dtype=float)
+    v = np.sin(t / 50)
+    v[437] = 10.0
+    sampled_t, sampled_v = _lttb(t, v, 100)
+
+    assert sampled_t.size == 100
+    assert sampled_t[0] == 0 and sampled_t[-1] == 999
+    assert np.all(np.diff(sampled_t) > 0)
+    assert 437 in sampled_t
+    assert sampled_v.max() == 10.0
+    assert _lttb(t[:50], v[:50], 100)[0].size == 50
+
+
+def test_readings_not_newer_than_the_last_are_ignored():
+    history = VitalsHistory()
+    assert history.append("P1", {"heartRate": 80.0}, T0 + 10)
+    assert not history.append("P1", {"heartRate": 90.0}, T0 + 10)  # the same reading polled again
+    assert not history.append("P1", {"heartRate": 70.0}, T0 + 5)
+    assert history.append("P1", {"heartRate": 85.0}, T0 + 20)
+
+    assert history.query("P1", "heartRate", points=10)["values"] == [80.0, 85.0]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "history.npz")
+    history = VitalsHistory(raw_capacity=50)
+    fill(history, "P1")
+    fill(history, "P2", readings=10)
+    history.append("P2", {"heartRate": None, "temperature": 101.2}, T0 + 100)
+    assert history.save(path) == 2
+
+    restored = VitalsHistory(raw_capacity=50)
+    assert restored.load(path) == 2
+    assert not restored.dirty
+    for patient_id in ("P1", "P2"):
+        for vital in ("heartRate", "temperature"):
+            for points, method in ((5, "lttb"), (40, "lttb"), (40, "minmax")):
+                assert restored.query(patient_id, vital, points=points, method=method) == \
+                    history.query(patient_id, vital, points=points, method=method)
+
+    # Restored rings keep accepting readings, including past a wrap
+    for i in range(60):
+        restored.append("P2", {"heartRate": 60.0}, T0 + 200 + i)
+    series = restored.query("P2", "heartRate", points=100, start=T0 + 215)
+    assert series["resolution"] == "raw"
+    assert len(series["values"]) == 45
+
+
+def test_save_is_skipped_when_nothing_changed(tmp_path):
+    path = tmp_path / "history.npz"
+    history = VitalsHistory()
+    fill(history, readings=5)
+    assert history.dirty
+    assert history.save(str(path)) == 1
+    assert not history.dirty
+
+    path.unlink()
+    assert history.save(str(path)) == 0
+    assert not path.exists()
+
+    history.append("P1", {"heartRate": 70.0}, T0 + 1000)
+    assert history.save(str(path)) == 1
+    assert path.exists()